@@ -5,21 +5,27 @@ import subprocess
 import sys
 import shutil
 from util import *
+from shuriken import package
 
-def get_latest_apache():
-    index_url = "https://downloads.apache.org/httpd/"
-    html = urllib.request.urlopen(index_url).read().decode()
+HTTPD_INDEX = "https://downloads.apache.org/httpd/"
+APR_INDEX = "https://downloads.apache.org/apr/"
+
+
+def parse_apache_index(html):
     versions = re.findall(r"httpd-(\d+\.\d+\.\d+)\.tar\.gz", html)
     latest = sorted(versions, key=lambda v: tuple(map(int, v.split("."))))[-1]
     tarball = f"httpd-{latest}.tar.gz"
-    url = index_url + tarball
+    url = HTTPD_INDEX + tarball
     return latest, tarball, url
 
 
-def get_latest_apr():
-    apr_index = "https://downloads.apache.org/apr/"
+def get_latest_apache():
+    return parse_apache_index(fetch_text(HTTPD_INDEX))
+
+
+def parse_apr_index(html_apr):
+    apr_index = APR_INDEX
 
-    html_apr = urllib.request.urlopen(apr_index).read().decode()
     apr_versions = re.findall(r"apr-(\d+\.\d+\.\d+)\.tar\.gz", html_apr)
     latest_apr = sorted(apr_versions, key=lambda v: tuple(map(int, v.split("."))))[-1]
     apr_tarball = f"apr-{latest_apr}.tar.gz"
@@ -32,14 +38,34 @@ def get_latest_apr():
 
     return (latest_apr, apr_tarball, apr_url), (latest_util, util_tarball, util_url)
 
+
+def get_latest_apr():
+    return parse_apr_index(fetch_text(APR_INDEX))
+
+
+# Performance modules loaded by scaffold/config.tmpl. mod_http2 and mod_brotli
+# need libraries that not every host has; the template only loads what exists.
+MODULES = ["deflate", "expires", "cache", "cache-disk", "headers", "proxy", "proxy-fcgi"]
+OPTIONAL_MODULES = {"http2": "libnghttp2", "brotli": "libbrotlienc"}
+
+
+def module_flags():
+    flags = [f"--enable-{m}=shared" for m in MODULES]
+    for module, library in OPTIONAL_MODULES.items():
+        if shutil.which("pkg-config") and subprocess.run(["pkg-config", "--exists", library]).returncode == 0:
+            flags.append(f"--enable-{module}=shared")
+        else:
+            warn(f"{library} not found, building without mod_{module}")
+    return " ".join(flags)
+
 # ----------------------------
 # Main
 # ----------------------------
 def main():
     system = platform.system()
     project_root = os.path.join(os.path.abspath("."), "apache")
-    build_dir = os.path.join(project_root, "build")
-    artifact_dir = os.path.join(project_root, "artifact")
+    build_dir = os.path.join(project_root, build_dir_name())
+    artifact_dir = os.path.join(project_root, artifact_dir_name())
 
     os.makedirs(build_dir, exist_ok=True)
     os.makedirs(artifact_dir, exist_ok=True)
@@ -47,35 +73,55 @@ def main():
     info(f"Artifact directory: {artifact_dir}")
 
     os.chdir(build_dir)
+    profile = build_profile()
+    apply_build_profile()
 
-    apache_latest, apache_tarball, apache_url = get_latest_apache()
-    info(f"Latest Apache: {apache_latest} -> {apache_tarball}")
-    download_file(apache_url, apache_tarball)
-    extract_tarball(apache_tarball)
+    with phase("apache", "resolve"):
+        apache_latest, apache_tarball, apache_url = locked("httpd", get_latest_apache)
+        info(f"Latest Apache: {apache_latest} -> {apache_tarball}")
+        (apr_latest, apr_tarball, apr_url), (util_latest, util_tarball, util_url) = locked("apr", get_latest_apr)
+        info(f"Latest APR: {apr_latest} -> {apr_tarball}")
+        info(f"Latest APR-util: {util_latest} -> {util_tarball}")
 
     apache_src_dir = os.path.join(build_dir, f"httpd-{apache_latest}")
 
-    (apr_latest, apr_tarball, apr_url), (util_latest, util_tarball, util_url) = get_latest_apr()
-    info(f"Latest APR: {apr_latest} -> {apr_tarball}")
-    info(f"Latest APR-util: {util_latest} -> {util_tarball}")
+    stamps = os.path.join(build_dir, ".stamps")
 
-    download_file(apr_url, apr_tarball)
-    download_file(util_url, util_tarball)
+    def fetch_sources():
+        if os.path.exists(apache_src_dir):
+            shutil.rmtree(apache_src_dir)
+        download_and_extract(apache_url, build_dir, apache_tarball)
+        download_and_extract(apr_url, build_dir, apr_tarball)
+        download_and_extract(util_url, build_dir, util_tarball)
 
-    extract_tarball(apr_tarball)
-    extract_tarball(util_tarball)
+        srclib_dir = os.path.join(apache_src_dir, "srclib")
+        os.makedirs(srclib_dir, exist_ok=True)
+        shutil.move(os.path.join(build_dir, f"apr-{apr_latest}"), os.path.join(srclib_dir, "apr"))
+        shutil.move(os.path.join(build_dir, f"apr-util-{util_latest}"), os.path.join(srclib_dir, "apr-util"))
+        info(f"APR + APR-util moved into {srclib_dir}")
 
-    srclib_dir = os.path.join(apache_src_dir, "srclib")
-    os.makedirs(srclib_dir, exist_ok=True)
-    shutil.move(os.path.join(build_dir, f"apr-{apr_latest}"), os.path.join(srclib_dir, "apr"))
-    shutil.move(os.path.join(build_dir, f"apr-util-{util_latest}"), os.path.join(srclib_dir, "apr-util"))
-    info(f"APR + APR-util moved into {srclib_dir}")
+    source = incremental("apache", "fetch", stamps, [apache_url, apr_url, util_url], fetch_sources,
+                         outputs=[os.path.join(apache_src_dir, "srclib", "apr-util")])
 
     if system in ("Linux", "Darwin"):
         info(f"Configuring Apache on {system}")
-        run(f"./configure --prefix={artifact_dir} --enable-so --enable-ssl --with-mpm=event --with-included-apr", cwd=apache_src_dir)
-        run(f"make -j{os.cpu_count()}", cwd=apache_src_dir)
-        run("make install", cwd=apache_src_dir)
+        autoconf_compiler_cache("apache")
+        configure_cmd = (f"./configure --prefix={artifact_dir} --enable-so --enable-ssl --with-mpm=event --with-included-apr "
+                         f"{module_flags()}")
+        configured = incremental("apache", "configure", stamps, [source, configure_cmd, toolchain_fingerprint()],
+                                 lambda: run_configure(configure_cmd, cwd=apache_src_dir),
+                                 outputs=[os.path.join(apache_src_dir, "Makefile")])
+        compiled = incremental("apache", "compile", stamps, [configured],
+                               lambda: run(f"make {jobs_flag()}", cwd=apache_src_dir),
+                               outputs=[os.path.join(apache_src_dir, "httpd")])
+        def install():
+            run("make install", cwd=apache_src_dir)
+            if profile["debug"]:
+                split_debug_symbols(artifact_dir, os.path.join(project_root, "artifact-debug"))
+
+        incremental("apache", "install", stamps, [compiled], install,
+                    outputs=[os.path.join(artifact_dir, "bin", "httpd")])
+        report_compiler_cache("apache")
         good(f"Apache installed locally at {artifact_dir}")
 
     elif system == "Windows":
@@ -102,7 +148,8 @@ def main():
             '-A x64',
             f'-DCMAKE_INSTALL_PREFIX="{artifact_dir}"',
             '-DENABLE_SSL=ON',
-            '-DENABLE_MODULES=shared'
+            '-DENABLE_MODULES=shared',
+            *cmake_profile_args(),
         ]
         
         if has_vcpkg:
@@ -116,14 +163,25 @@ def main():
             warn("vcpkg not found - you may need to manually provide OpenSSL and other dependencies")
             warn("Consider installing vcpkg: https://github.com/microsoft/vcpkg")
         
-        run(" ".join(cmake_args), cwd=cmake_build_dir)
-        run("cmake --build . --config Release", cwd=cmake_build_dir)
-        run("cmake --install . --config Release", cwd=cmake_build_dir)
+        configured = incremental("apache", "configure", stamps, [source, cmake_args],
+                                 lambda: run(" ".join(cmake_args), cwd=cmake_build_dir),
+                                 outputs=[os.path.join(cmake_build_dir, "CMakeCache.txt")])
+        compiled = incremental("apache", "compile", stamps, [configured],
+                               lambda: run(f"cmake --build . --config {cmake_build_config()}", cwd=cmake_build_dir))
+        incremental("apache", "install", stamps, [compiled],
+                    lambda: run(f"cmake --install . --config {cmake_build_config()}", cwd=cmake_build_dir),
+                    outputs=[os.path.join(artifact_dir, "bin", "httpd.exe")])
         good(f"Apache installed locally at {artifact_dir}")
 
     else:
         raise RuntimeError(f"Unsupported OS: {system}")
-    shutil.copy2("scaffold/.ninja", "artifact")
+
+    with phase("apache", "package"):
+        # apache keeps its ninja files at the top of scaffold/
+        shutil.copytree(os.path.join(project_root, "scaffold"), os.path.join(artifact_dir, ".ninja"), dirs_exist_ok=True)
+        add_host_detection(os.path.join(artifact_dir, ".ninja", "scripts", "postinstall.ns"))
+        write_forge("apache", artifact_dir)
+        package("apache", artifact_dir)
 
 
 if __name__ == "__main__":
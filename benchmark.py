@@ -0,0 +1,242 @@
+# Catch regressions in build time, memory and artifact size.
+#
+#   uv run -m benchmark [--runs N] [--history N] [component ...]
+#
+# Every component is rebuilt from scratch (the build directory of the
+# NINJA_PROFILE build profile and artifact/ removed, no compiler or configure
+# cache) from the warm download cache with the versions pinned in
+# versions.lock, so no network is touched: run ./build.sh once first. Each run
+# is appended to an append-only JSON-lines file keyed by git commit and
+# upstream version, and compared against the previous runs of the same
+# component and profile on the same host.
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from datetime import datetime, timezone
+from pathlib import Path
+from util import *
+from util import _file_lock, _read_lockfile, _rss_bytes
+from orchestrator import COMPONENTS, fmt_duration
+from mariadb.main import lock_key
+
+ROOT = Path(__file__).resolve().parent
+RESULTS = Path(os.environ.get("NINJA_BENCH_RESULTS", CACHE_DIR / "benchmarks.jsonl"))
+HISTORY = int(os.environ.get("NINJA_BENCH_HISTORY", 5))
+# A change has to be this large (relative) *and* outside the noise of the
+# history (Z_LIMIT standard deviations) to be flagged
+THRESHOLD = float(os.environ.get("NINJA_BENCH_THRESHOLD", 0.05))
+Z_LIMIT = 3
+
+METRICS = ["wall", "cpu", "max_rss", "artifact_bytes"]
+
+
+def version_keys(component):
+    """versions.lock entries a component is built from."""
+    system, arch = get_system_arch()
+    return {
+        "apache": ["httpd", "apr"],
+        "postgres": ["postgres"],
+        "php": ["php"],
+        "mariadb": [lock_key()],
+        "caddy": [f"go-{system}-{arch}"],
+    }.get(component, [])
+
+
+def upstream_versions(component):
+    pinned = _read_lockfile()
+    versions = {}
+    for key in version_keys(component):
+        value = pinned.get(key)
+        if value is None:
+            raise RuntimeError(f"{key} is not pinned in {LOCKFILE}; run ./build.sh once to warm the caches")
+        # APR pins two (version, tarball, url) entries, everything else one
+        versions[key] = "/".join(v[0] for v in value) if isinstance(value[0], list) else value[0]
+    return versions
+
+
+def git_commit():
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    return git("rev-parse", "HEAD") or "unknown", git("status", "--porcelain", "--untracked-files=no") != ""
+
+
+def tree_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            p = os.path.join(root, name)
+            if not os.path.islink(p):
+                total += os.path.getsize(p)
+    return total
+
+
+def bench_one(component, log):
+    """Build component once from scratch. Returns the metrics of the run."""
+    for d in (build_dir_name(), artifact_dir_name()):
+        shutil.rmtree(ROOT / component / d, ignore_errors=True)
+
+    env = os.environ.copy()
+    env.update({
+        "NINJA_OFFLINE": "1",
+        "NINJA_CACHE_ONLY": "1",
+        "NINJA_COMPILER_CACHE": "off",
+        "NINJA_CONFIGURE_CACHE": "off",
+        "NINJA_COMPONENT": component,
+        "TQDM_DISABLE": "1",
+    })
+    start = time.time()
+    process = subprocess.Popen([sys.executable, "-m", f"{component}.main"], cwd=ROOT, env=env,
+                               stdout=log, stderr=subprocess.STDOUT)
+    if hasattr(os, "wait4"):
+        # Children are reaped by the builder, so this covers the whole build
+        _, status, usage = os.wait4(process.pid, 0)
+        returncode = os.waitstatus_to_exitcode(status)
+        cpu, max_rss = usage.ru_utime + usage.ru_stime, _rss_bytes(usage.ru_maxrss)
+    else:
+        returncode = process.wait()
+        cpu, max_rss = None, None
+    wall = time.time() - start
+
+    return {
+        "ok": returncode == 0,
+        "wall": wall,
+        "cpu": cpu,
+        "max_rss": max_rss,
+        "artifact_bytes": tree_size(ROOT / component / artifact_dir_name()),
+    }
+
+
+def load_results():
+    if not RESULTS.exists():
+        return []
+    with open(RESULTS, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_result(record):
+    RESULTS.parent.mkdir(parents=True, exist_ok=True)
+    with _file_lock(RESULTS.with_name(RESULTS.name + ".lock")), open(RESULTS, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def fmt_metric(metric, value):
+    if value is None:
+        return "-"
+    if metric == "wall" or metric == "cpu":
+        return fmt_duration(value)
+    return f"{value / 1024 ** 2:.1f}MiB"
+
+
+def compare(component, runs, history):
+    """Compare the median of this session's runs with earlier ones.
+    Returns the metrics that regressed."""
+    regressed = []
+    previous = history[-HISTORY:]
+    if len(previous) < 2:
+        warn(f"  {component}: {len(previous)} earlier run(s) on this host, need 2 to compare")
+        return regressed
+
+    last = previous[-1]
+    now = runs[-1]
+    changed = {k: f"{last['versions'].get(k)} -> {v}" for k, v in now["versions"].items() if last["versions"].get(k) != v}
+    if changed:
+        info(f"  {component}: upstream changed since last run: {', '.join(f'{k} {v}' for k, v in changed.items())}")
+    if last["commit"] != now["commit"]:
+        info(f"  {component}: commit {last['commit'][:10]} -> {now['commit'][:10]}")
+
+    for metric in METRICS:
+        values = [r[metric] for r in previous if r.get(metric) is not None]
+        current = [r[metric] for r in runs if r.get(metric) is not None]
+        if len(values) < 2 or not current:
+            continue
+        mean, stdev = statistics.mean(values), statistics.stdev(values)
+        value = statistics.median(current)
+        delta = (value - mean) / mean if mean else 0.0
+        z = (value - mean) / stdev if stdev else (float("inf") if value != mean else 0.0)
+        line = (f"  {component:<10} {metric:<15} {fmt_metric(metric, value):>10}  "
+                f"mean {fmt_metric(metric, mean):>10} ± {fmt_metric(metric, stdev):<9} {delta:+7.1%}  z {z:+.1f}")
+        if delta > THRESHOLD and z > Z_LIMIT:
+            err(line + "  REGRESSION")
+            regressed.append(metric)
+        elif delta < -THRESHOLD and z < -Z_LIMIT:
+            good(line + "  improved")
+        else:
+            info(line)
+    return regressed
+
+
+def main(argv):
+    global HISTORY
+    parser = argparse.ArgumentParser(prog="benchmark", description="Build-time regression benchmarks")
+    parser.add_argument("components", nargs="*", default=COMPONENTS)
+    parser.add_argument("--runs", type=int, default=1, help="builds per component (the median is compared)")
+    parser.add_argument("--history", type=int, default=HISTORY, help="earlier runs to compare against")
+    args = parser.parse_args(argv)
+    HISTORY = args.history
+
+    commit, dirty = git_commit()
+    host = platform.node()
+    results = load_results()
+    regressions = {}
+    failed = []
+
+    for component in args.components:
+        versions = upstream_versions(component)
+        runs = []
+        for n in range(1, args.runs + 1):
+            info(f"[BENCH] {component} run {n}/{args.runs} ({', '.join(f'{k} {v}' for k, v in versions.items())})")
+            with tempfile.NamedTemporaryFile("w+", prefix=f"ninja-bench-{component}-", suffix=".log", delete=False) as log:
+                metrics = bench_one(component, log)
+            record = {
+                "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "commit": commit,
+                "dirty": dirty,
+                "host": host,
+                "jobs": job_count(),
+                "profile": BUILD_PROFILE,
+                "component": component,
+                "versions": versions,
+                **metrics,
+            }
+            append_result(record)
+            if not metrics["ok"]:
+                err(f"[BENCH FAILED] {component}, see {log.name}")
+                failed.append(component)
+                break
+            os.remove(log.name)
+            good(f"[BENCH] {component} {fmt_duration(metrics['wall'])} wall, "
+                 f"{fmt_metric('cpu', metrics['cpu'])} CPU, {fmt_metric('max_rss', metrics['max_rss'])} peak RSS, "
+                 f"{fmt_metric('artifact_bytes', metrics['artifact_bytes'])} artifact")
+            runs.append(record)
+
+        if runs:
+            history = [r for r in results if r["component"] == component and r["host"] == host and r["ok"]
+                       and r.get("profile", "generic") == BUILD_PROFILE]
+            info(f"\n[COMPARE] {component}")
+            regressed = compare(component, runs, history)
+            if regressed:
+                regressions[component] = regressed
+
+    info(f"\nResults appended to {RESULTS}")
+    if failed:
+        err(f"Failed: {', '.join(failed)}")
+    if regressions:
+        err("Regressions: " + "; ".join(f"{c} ({', '.join(m)})" for c, m in regressions.items()))
+    return 1 if failed or regressions else 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main(sys.argv[1:]))
+    except Exception as e:
+        err(str(e))
+        sys.exit(1)
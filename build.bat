@@ -1,25 +1,11 @@
 @echo off
 REM Build script for Windows (CMD)
-REM Usage: build.bat
+REM Usage: build.bat [component ...]
 
-echo Building PHP...
-uv run -m php.main
+echo Building all components...
+uv run -m orchestrator %*
 if %errorlevel% neq 0 (
-    echo PHP build failed!
-    exit /b %errorlevel%
-)
-
-echo Building Apache...
-uv run -m apache.main
-if %errorlevel% neq 0 (
-    echo Apache build failed!
-    exit /b %errorlevel%
-)
-
-echo Building MariaDB...
-uv run -m mariadb.main
-if %errorlevel% neq 0 (
-    echo MariaDB build failed!
+    echo Build failed!
     exit /b %errorlevel%
 )
 
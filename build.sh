@@ -1,5 +1,3 @@
 #!/bin/bash
-uv run -m php.main
-uv run -m apache.main
-uv run -m mariadb.main
-uv run -m postgres.main
+# Builds every component in parallel. Pass component names to build a subset.
+uv run -m orchestrator "$@"
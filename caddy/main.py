@@ -1,13 +1,28 @@
 from util import *
+from shuriken import package
 from pathlib import Path
 import os
 import shutil
 
 BASE_DIR = Path.cwd() / "caddy"
 BUILD_DIR = BASE_DIR / "build"
-ARTIFACT_DIR = BASE_DIR / "artifact"
+ARTIFACT_DIR = BASE_DIR / artifact_dir_name()
 GO_DIR = BUILD_DIR / "go"
 GO_VERSION = "1.21.0"
+GO_RELEASES = "https://go.dev/dl/?mode=json&include=all"
+
+
+def parse_go_release(releases, system, arch):
+    filename = f"go{GO_VERSION}.{system}-{arch}.{'zip' if system == 'windows' else 'tar.gz'}"
+    for release in releases:
+        for f in release["files"]:
+            if f["filename"] == filename:
+                return [GO_VERSION, filename, f"https://go.dev/dl/{filename}", f["sha256"]]
+    raise RuntimeError(f"{filename} is not listed on go.dev")
+
+
+def get_go_release(system, arch):
+    return parse_go_release(fetch_json(GO_RELEASES), system, arch)
 
 def go_bin_path(system):
     return GO_DIR / "bin" / ("go.exe" if system == "windows" else "go")
@@ -20,6 +35,8 @@ def caddy_path():
 
 def main():
     system, arch = get_system_arch()
+    profile = build_profile()
+    apply_build_profile()
 
     os.makedirs(BASE_DIR, exist_ok=True)
     os.makedirs(BUILD_DIR, exist_ok=True)
@@ -30,8 +47,11 @@ def main():
     # Install Go locally
     if not go_bin.exists():
         info("Installing Go locally...")
-        filename = download_go(system, arch)
-        extract_go(filename, system, GO_DIR)
+        with phase("caddy", "resolve"):
+            go_version, _, _, go_sha256 = locked(f"go-{system}-{arch}", lambda: get_go_release(system, arch))
+        with phase("caddy", "fetch"):
+            filename = download_go(system, arch, go_version, out_dir=BUILD_DIR, checksum=go_sha256)
+            extract_go(filename, system, GO_DIR)
         good(f"Go downloaded and extracted to {GO_DIR}")
     else:
         good("Go already installed locally.")
@@ -45,9 +65,13 @@ def main():
     env = os.environ.copy()
     env["GOBIN"] = str(BUILD_DIR)
     env["PATH"] = f"{str(GO_DIR / 'bin')}{os.pathsep}{env['PATH']}"
+    if profile["debug"]:
+        # xcaddy strips with -ldflags "-w -s" unless told otherwise
+        env["XCADDY_GO_BUILD_FLAGS"] = "-trimpath"
     if not xcaddy_bin.exists():
         info("Installing xcaddy...")
-        run(f"{str(go_bin)} install github.com/caddyserver/xcaddy/cmd/xcaddy@latest", env=env)
+        with phase("caddy", "configure"):
+            run(f"{str(go_bin)} install github.com/caddyserver/xcaddy/cmd/xcaddy@latest", env=env)
     else:
         good("xcaddy already installed.")
 
@@ -56,11 +80,20 @@ def main():
 
     plugins = []
 
-    if not caddy_bin.exists():
+    def build_caddy():
         info("Building Caddy...")
-        run(f"{str(xcaddy_bin)} build {"--with" + ','.join(plugins) if len(plugins) > 0 else ''}--output {str(caddy_bin)}", env=env)
-    else:
-        good("Caddy already built.")
+        with_plugins = "".join(f"--with {p} " for p in plugins)
+        run(f"{str(xcaddy_bin)} build {with_plugins}--output {str(caddy_bin)}", env=env)
+        if profile["debug"]:
+            split_debug_symbols(ARTIFACT_DIR, BASE_DIR / "artifact-debug")
+
+    incremental("caddy", "compile", BUILD_DIR / ".stamps", [plugins, BUILD_PROFILE, env.get("GOAMD64")],
+                build_caddy, outputs=[caddy_bin])
+
+    with phase("caddy", "package"):
+        shutil.copytree(BASE_DIR / "scaffold", ARTIFACT_DIR, dirs_exist_ok=True)
+        write_forge("caddy", ARTIFACT_DIR)
+        package("caddy", ARTIFACT_DIR)
 
     good("\n Done!")
     good(f"Go: {go_bin}")
@@ -0,0 +1,26 @@
+<?php
+// One primary-key lookup per request through mysqli (MariaDB) or PDO (PostgreSQL).
+// Connection details come from the pool's env[] entries set by the load test.
+$driver = getenv('NINJA_DB') ?: 'mariadb';
+$port = (int) getenv('NINJA_DB_PORT');
+$id = random_int(1, 1000);
+
+if ($driver === 'mariadb') {
+    $db = new mysqli('127.0.0.1', 'root', '', 'ninja_load', $port);
+    $stmt = $db->prepare('SELECT id, name FROM items WHERE id = ?');
+    $stmt->bind_param('i', $id);
+    $stmt->execute();
+    $row = $stmt->get_result()->fetch_assoc();
+} else {
+    $db = new PDO("pgsql:host=127.0.0.1;port=$port;dbname=postgres", 'postgres');
+    $stmt = $db->prepare('SELECT id, name FROM items WHERE id = ?');
+    $stmt->execute([$id]);
+    $row = $stmt->fetch(PDO::FETCH_ASSOC);
+}
+
+if (!$row) {
+    http_response_code(500);
+    exit;
+}
+header('Content-Type: application/json');
+echo json_encode($row);
@@ -0,0 +1,4 @@
+<?php
+// Smallest possible dynamic response: measures the Caddy -> FastCGI -> PHP round trip.
+header('Content-Type: text/plain');
+echo "Hello, world!\n";
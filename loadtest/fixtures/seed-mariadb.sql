@@ -0,0 +1,6 @@
+CREATE DATABASE IF NOT EXISTS ninja_load;
+USE ninja_load;
+CREATE TABLE items (id INT PRIMARY KEY, name VARCHAR(64) NOT NULL);
+INSERT INTO items
+WITH RECURSIVE seq (n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < 1000)
+SELECT n, CONCAT('item-', n) FROM seq;
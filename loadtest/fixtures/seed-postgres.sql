@@ -0,0 +1,2 @@
+CREATE TABLE items (id INT PRIMARY KEY, name VARCHAR(64) NOT NULL);
+INSERT INTO items SELECT n, 'item-' || n FROM generate_series(1, 1000) AS n;
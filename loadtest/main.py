@@ -0,0 +1,292 @@
+# Load test the Caddy + PHP-FPM stack as shipped.
+#
+#   uv run -m loadtest.main [--pm dynamic:5 static:8 ...] [--concurrency 1 8 32 ...]
+#                           [--scenarios hello static db] [--db mariadb|postgres]
+#                           [--transport unix|tcp]
+#
+# Caddy and php-fpm are started from their artifacts with their scaffold
+# configs (see startup.py), serving the fixtures in loadtest/fixtures:
+#   hello   hello.php, the smallest PHP response
+#   db      db.php, one primary-key lookup in MariaDB (mysqli) or PostgreSQL (PDO)
+#   static  a large static file served by Caddy's file_server
+# For every pm setting php-fpm is restarted with that pool, then each scenario
+# is driven at each concurrency level by a closed-loop HTTP/1.1 keep-alive
+# client (asyncio, spread over several processes so the client is not the
+# bottleneck). Throughput, p50/p95/p99 latency and error rate are reported.
+# Caddy reaches php-fpm over a unix socket or loopback TCP (--transport).
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from util import *
+from startup import DAEMONS, artifact_dir, caddy_prepare, fpm_prepare, free_port, launch, shutdown
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+SCENARIOS = {"hello": "/hello.php", "db": "/db.php", "static": "/static.bin"}
+REQUEST_TIMEOUT = 30
+
+
+# ----------------------------
+# Load generator
+# ----------------------------
+async def _read_response(reader):
+    """Read one response. Returns (status, body bytes, connection closed)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed by server")
+    status = int(status_line.split()[1])
+    length, chunked, close = None, False, False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "transfer-encoding":
+            chunked = "chunked" in value
+        elif name == "connection":
+            close = value == "close"
+
+    size = 0
+    if chunked:
+        while True:
+            n = int((await reader.readline()).split(b";")[0], 16)
+            if n == 0:
+                while await reader.readline() not in (b"\r\n", b"\n", b""):
+                    pass
+                break
+            size += len(await reader.readexactly(n))
+            await reader.readexactly(2)
+    elif length is not None:
+        while size < length:
+            chunk = await reader.read(min(length - size, 1 << 20))
+            if not chunk:
+                raise ConnectionError("connection closed mid-body")
+            size += len(chunk)
+    else:
+        while chunk := await reader.read(1 << 20):
+            size += len(chunk)
+        close = True
+    return status, size, close
+
+
+async def _worker(port, path, measure_from, deadline, result):
+    request = (f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n"
+               f"User-Agent: ninja-loadtest\r\n\r\n").encode()
+    writer = None
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(request)
+            await writer.drain()
+            status, size, close = await asyncio.wait_for(_read_response(reader), REQUEST_TIMEOUT)
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            if start >= measure_from:
+                kind = type(e).__name__
+                result["errors"][kind] = result["errors"].get(kind, 0) + 1
+            if writer is not None:
+                writer.close()
+                writer = None
+            await asyncio.sleep(0.01)
+            continue
+
+        if start >= measure_from:
+            if status < 400:
+                result["latencies"].append(time.perf_counter() - start)
+                result["bytes"] += size
+            else:
+                result["errors"][str(status)] = result["errors"].get(str(status), 0) + 1
+        if close:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def _load_async(port, path, concurrency, duration, warmup):
+    result = {"latencies": [], "bytes": 0, "errors": {}}
+    measure_from = time.perf_counter() + warmup
+    deadline = measure_from + duration
+    await asyncio.gather(*(_worker(port, path, measure_from, deadline, result) for _ in range(concurrency)))
+    return result
+
+
+def _load_process(args):
+    return asyncio.run(_load_async(*args))
+
+
+def generate_load(port, path, concurrency, duration, warmup, processes):
+    """Drive GET path with concurrency connections. Returns the metrics."""
+    processes = max(1, min(processes, concurrency))
+    shares = [concurrency // processes + (1 if i < concurrency % processes else 0) for i in range(processes)]
+    with ProcessPoolExecutor(processes) as pool:
+        parts = list(pool.map(_load_process, [(port, path, n, duration, warmup) for n in shares]))
+
+    latencies = sorted(l for p in parts for l in p["latencies"])
+    errors = {}
+    for p in parts:
+        for kind, count in p["errors"].items():
+            errors[kind] = errors.get(kind, 0) + count
+    failed = sum(errors.values())
+
+    def percentile(q):
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else None
+
+    return {
+        "requests": len(latencies),
+        "throughput": len(latencies) / duration,
+        "bytes_per_second": sum(p["bytes"] for p in parts) / duration,
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "error_rate": failed / (failed + len(latencies)) if failed or latencies else 0.0,
+        "errors": errors,
+    }
+
+
+# ----------------------------
+# Stack
+# ----------------------------
+def pool_settings(spec):
+    """'dynamic:16' -> www.conf.tmpl options. Without a count the pool is sized
+    from this host, like a fresh install."""
+    mode, _, children = spec.partition(":")
+    if mode not in ("static", "dynamic", "ondemand"):
+        raise RuntimeError(f"Unknown pm mode in {spec!r}")
+    return {"pm": mode, "max_children": int(children or 0)}
+
+
+# PHP extension each --db needs for db.php
+DB_EXTENSIONS = {"mariadb": "mysqli", "postgres": "pdo_pgsql"}
+
+
+def check_db_driver(kind):
+    """Fail before starting anything when php-fpm lacks the db.php driver."""
+    fpm = artifact_dir("php") / "sbin" / ("php-fpm.exe" if os.name == "nt" else "php-fpm")
+    modules = subprocess.run([str(fpm), "-m"], capture_output=True, text=True).stdout.lower().split()
+    if DB_EXTENSIONS[kind] not in modules:
+        raise RuntimeError(f"php-fpm has no {DB_EXTENSIONS[kind]} extension, so db.php cannot reach {kind}; "
+                           f"rebuild PHP with it (pdo_pgsql needs pg_config or a built postgres)")
+
+
+def start_database(kind, workdir):
+    daemon = DAEMONS[kind]
+    instance = workdir / kind
+    instance.mkdir()
+    state = daemon["prepare"](instance)
+    process, _, _ = launch(daemon, state)
+    seed = FIXTURES / f"seed-{kind}.sql"
+    if kind == "mariadb":
+        run(f'"{state["client"]}" --no-defaults -h 127.0.0.1 -P {state["port"]} -u root < "{seed}"')
+    else:
+        run(f'"{state["client"]}" -h 127.0.0.1 -p {state["port"]} -U postgres -d postgres -q -f "{seed}"')
+    return daemon, process, state["port"]
+
+
+def fmt_ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.1f}ms"
+
+
+def main(argv):
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(prog="loadtest", description="Load test the Caddy + PHP-FPM stack")
+    parser.add_argument("--pm", nargs="+", default=["dynamic", "dynamic:5", f"static:{cpus}", f"static:{cpus * 2}"],
+                        help="pool settings as mode[:max_children] (default: host-sized dynamic, the old dynamic:5, "
+                             "static at 1x and 2x cores)")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32, 128])
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=["hello", "static"])
+    parser.add_argument("--db", choices=["mariadb", "postgres"], default="mariadb", help="database for the db scenario")
+    parser.add_argument("--transport", choices=["unix", "tcp"], default="tcp" if os.name == "nt" else "unix",
+                        help="FastCGI transport between Caddy and php-fpm")
+    parser.add_argument("--duration", type=float, default=10, help="measured seconds per run")
+    parser.add_argument("--warmup", type=float, default=2, help="unmeasured seconds before each run")
+    parser.add_argument("--processes", type=int, default=max(1, min(4, cpus // 2)), help="load generator processes")
+    parser.add_argument("--static-size", type=int, default=8, help="size of the static file in MiB")
+    parser.add_argument("--json", help="write all results to this file")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch instances")
+    args = parser.parse_args(argv)
+
+    if "db" in args.scenarios:
+        check_db_driver(args.db)
+
+    workdir = Path(tempfile.mkdtemp(prefix="ninja-loadtest-"))
+    php_port = free_port()
+    # Every pool listens on the same socket, so Caddy is started only once
+    php_socket = workdir / "php-fpm.sock" if args.transport == "unix" else None
+    results, running = [], []
+    try:
+        pool_env = {}
+        if "db" in args.scenarios:
+            info(f"[LOADTEST] starting {args.db}")
+            db_daemon, db_process, db_port = start_database(args.db, workdir)
+            running.append((db_daemon, db_process))
+            pool_env = {"env": {"NINJA_DB": args.db, "NINJA_DB_PORT": db_port}}
+
+        caddy_instance = workdir / "caddy"
+        caddy_instance.mkdir()
+        caddy = caddy_prepare(caddy_instance, php_port=php_port, php_socket=php_socket)
+        for fixture in ("hello.php", "db.php"):
+            shutil.copy2(FIXTURES / fixture, caddy_instance / "projects" / fixture)
+        with open(caddy_instance / "projects" / "static.bin", "wb") as f:
+            for _ in range(args.static_size):
+                f.write(os.urandom(1024 ** 2))
+        caddy_process, _, _ = launch(DAEMONS["caddy"], caddy)
+        running.append((DAEMONS["caddy"], caddy_process))
+
+        for spec in args.pm:
+            instance = workdir / f"php-{spec.replace(':', '-')}"
+            instance.mkdir()
+            fpm = fpm_prepare(instance, port=php_port, pool={**pool_settings(spec), **pool_env}, socket_path=php_socket)
+            fpm_process, _, _ = launch(DAEMONS["php"], fpm)
+            try:
+                info(f"\n[LOADTEST] pm {spec} over {args.transport}")
+                info(f"  {'scenario':<8} {'conc':>5} {'req/s':>9} {'MB/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}")
+                for scenario in args.scenarios:
+                    for concurrency in args.concurrency:
+                        r = generate_load(caddy["port"], SCENARIOS[scenario], concurrency,
+                                          args.duration, args.warmup, args.processes)
+                        results.append({"pm": spec, "scenario": scenario, "concurrency": concurrency, **r})
+                        line = (f"  {scenario:<8} {concurrency:>5} {r['throughput']:>9.1f} "
+                                f"{r['bytes_per_second'] / 1e6:>8.1f} {fmt_ms(r['p50']):>9} {fmt_ms(r['p95']):>9} "
+                                f"{fmt_ms(r['p99']):>9} {r['error_rate']:>7.1%}")
+                        (err if r["error_rate"] else good)(line)
+                        if r["errors"]:
+                            warn(f"    errors: {', '.join(f'{k} x{v}' for k, v in r['errors'].items())}")
+            finally:
+                shutdown(DAEMONS["php"], fpm_process)
+    finally:
+        for daemon, process in reversed(running):
+            shutdown(daemon, process)
+        if args.keep:
+            info(f"Instances kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"host": platform.node(), "time": time.time(), "duration": args.duration,
+                       "transport": args.transport, "results": results}, f, indent=2)
+        good(f"Results written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main(sys.argv[1:]))
+    except Exception as e:
+        err(str(e))
+        sys.exit(1)
@@ -1,7 +1,6 @@
 # starting over using the mariadb rest api to get prebuilts for linux and windows.
 
 import platform
-import requests
 import json
 import toml
 if platform.system() == "Windows":
@@ -10,21 +9,29 @@ elif platform.system() == "Linux":
     import tarfile
 
 from util import *
+from shuriken import package
 from pathlib import Path
 
 def get_paths():
     root = Path.cwd() / "mariadb"
-    return { "root": root, "artifact": root / "artifact", "build": root / "build"}
+    return { "root": root, "artifact": root / artifact_dir_name(), "build": root / "build"}
 
-def get_major_release(url):
-    res = requests.get(url)
-    data = res.json()
+MARIADB_API = "https://downloads.mariadb.org/rest-api/mariadb/"
+
+def lock_key():
+    # The REST API picks a different file per platform
+    return f"mariadb-{platform.system().lower()}-{platform.machine().lower()}"
+
+def parse_major_release(data):
     releases = data["major_releases"]
     latest = next((r for r in releases if r["release_status"] == "Stable"), None)
     return latest["release_id"]
 
+def get_major_release(url):
+    return parse_major_release(fetch_json(url))
+
 def update_shuriken_version(root, version):
-    manifest_path = root / "scaffold" / "manifest.toml"
+    manifest_path = root / "scaffold" / ".ninja" / "manifest.toml"
     with open(manifest_path, "r") as t:
         data = toml.load(t)
 
@@ -36,9 +43,7 @@ def update_shuriken_version(root, version):
     with open(manifest_path, "w") as f:
         toml.dump(data, f)
     
-def fetch_artifact(url, version, artifact_path):
-    res = requests.get(f"{url}{version}/")
-    data = res.json()
+def parse_artifact(data):
     releases = data["releases"]
     version, info = next(iter(releases.items()))
     files = info["files"]
@@ -61,8 +66,11 @@ def fetch_artifact(url, version, artifact_path):
     checksum = artifact["checksum"]["sha256sum"]
     return (version, download_url, checksum)
 
+def fetch_artifact(url, version, artifact_path):
+    return parse_artifact(fetch_json(f"{url}{version}/"))
+
 def download_win_linux():
-    url = "https://downloads.mariadb.org/rest-api/mariadb/"
+    url = MARIADB_API
     paths = get_paths()
 
     if not paths["build"].exists(): paths["build"].mkdir(parents=True, exist_ok=True)
@@ -70,23 +78,29 @@ def download_win_linux():
 
     info("Fetching MariaDB through REST API")
     
-    major_release = get_major_release(url)
-    version, archive_url, checksum = fetch_artifact(url, major_release, paths["artifact"])
+    if BUILD_PROFILE != "generic":
+        warn(f"MariaDB ships prebuilt binaries on {platform.system()}, the {BUILD_PROFILE} profile does not apply")
 
-    archive_path = paths["build"] / "latest.tar.gz" if platform.system() == "Linux" else paths["build"] / "latest.zip"
+    with phase("mariadb", "resolve"):
+        version, archive_url, checksum = locked(
+            lock_key(), lambda: fetch_artifact(url, get_major_release(url), paths["artifact"]))
 
-    download_file(archive_url, archive_path, checksum=checksum)
+    archive_path = paths["build"] / "latest.tar.gz" if platform.system() == "Linux" else paths["build"] / "latest.zip"
 
-    if platform.system() == "Windows":
-        extract_zip(archive_path, paths["build"])
-    elif platform.system() == "Linux":
-        extract_tarball(archive_path, paths["build"])
+    extracted = paths["build"] / strip_extension(archive_url.rsplit("/", 1)[-1], [".tar.gz", ".zip"])
+    incremental("mariadb", "fetch", paths["build"] / ".stamps", [archive_url, checksum],
+                lambda: download_and_extract(archive_url, paths["build"], archive_path, checksum=checksum, connections=4),
+                outputs=[extracted])
+    # The shuriken ships the prebuilt, so it goes into the artifact like a local install
+    incremental("mariadb", "install", paths["build"] / ".stamps", [archive_url, checksum],
+                lambda: shutil.copytree(extracted, paths["artifact"], symlinks=True, dirs_exist_ok=True),
+                outputs=[paths["artifact"] / "bin"])
     update_shuriken_version(paths["root"], version)
     
 def mac_main():
     project_root = os.path.join(os.path.abspath("."), "mariadb")
     build_dir = os.path.join(project_root, "build")
-    mariadb_artifact_dir = os.path.join(project_root, "artifact")
+    mariadb_artifact_dir = os.path.join(project_root, artifact_dir_name())
     mariadb_repo_url = "https://github.com/MariaDB/server.git"
     mariadb_src_dir = os.path.join(build_dir, "mariadb-server")
 
@@ -95,17 +109,18 @@ def mac_main():
     info(f"Working directory: {build_dir}")
     info(f"MariaDB artifact directory: {mariadb_artifact_dir}")
 
-    if not os.path.exists(mariadb_src_dir):
-        info("Cloning MariaDB repository")
-        run(f"git clone {mariadb_repo_url} {mariadb_src_dir}")
-    else:
-        info("MariaDB source already exists, pulling latest changes")
-        run("git pull", cwd=mariadb_src_dir)
+    with phase("mariadb", "fetch"):
+        if not os.path.exists(mariadb_src_dir):
+            info("Cloning MariaDB repository")
+            run(f"git clone {mariadb_repo_url} {mariadb_src_dir}")
+        else:
+            info("MariaDB source already exists, pulling latest changes")
+            run("git pull", cwd=mariadb_src_dir)
 
-    info("Initializing submodules")
-    run("git submodule update --init --recursive", cwd=mariadb_src_dir)
+        info("Initializing submodules")
+        run("git submodule update --init --recursive", cwd=mariadb_src_dir)
 
-    cmake_build_dir = os.path.join(mariadb_src_dir, "build")
+    cmake_build_dir = os.path.join(mariadb_src_dir, build_dir_name())
     os.makedirs(cmake_build_dir, exist_ok=True)
 
     info("Configuring MariaDB with CMake")
@@ -118,14 +133,30 @@ def mac_main():
         "-DWITH_ZLIB=system",
         "-DWITH_UNIT_TESTS=OFF",
     ]
+    cmake_args += cmake_compiler_cache("mariadb")
+    cmake_args += cmake_profile_args()
+
+    stamps = os.path.join(build_dir, ".stamps")
+    source = subprocess.run(["git", "rev-parse", "HEAD"], cwd=mariadb_src_dir,
+                            capture_output=True, text=True).stdout.strip()
     
-    run(" ".join(cmake_args), cwd=cmake_build_dir)
+    configured = incremental("mariadb", "configure", stamps, [source, cmake_args, toolchain_fingerprint()],
+                             lambda: run(" ".join(cmake_args), cwd=cmake_build_dir),
+                             outputs=[os.path.join(cmake_build_dir, "CMakeCache.txt")])
 
     info("Compiling MariaDB")
-    run(f"cmake --build . -- -j{os.cpu_count()}", cwd=cmake_build_dir)
+    compiled = incremental("mariadb", "compile", stamps, [configured],
+                           lambda: run(f"cmake --build . -- {jobs_flag()}", cwd=cmake_build_dir))
 
     info("Installing MariaDB locally")
-    run("cmake --install .", cwd=cmake_build_dir)
+    def install():
+        run("cmake --install .", cwd=cmake_build_dir)
+        if build_profile()["debug"]:
+            split_debug_symbols(mariadb_artifact_dir, os.path.join(project_root, "artifact-debug"))
+
+    incremental("mariadb", "install", stamps, [compiled], install,
+                outputs=[os.path.join(mariadb_artifact_dir, "bin", "mariadbd")])
+    report_compiler_cache("mariadb")
 
     good(f"MariaDB installed locally at {mariadb_artifact_dir}")
 
@@ -137,7 +168,13 @@ def main():
     else:
         error(f"Unsupported platform: {platform.system()}")
     
-    shutil.copy2("scaffold/*", "artifact/")
+    with phase("mariadb", "package"):
+        paths = get_paths()
+        shutil.copytree(paths["root"] / "scaffold", paths["artifact"], dirs_exist_ok=True)
+        add_host_detection(paths["artifact"] / ".ninja" / "postinstall.ns")
+        prebuilt = platform.system() != "Darwin"
+        write_forge("mariadb", paths["artifact"], profile="generic" if prebuilt else None)
+        package("mariadb", paths["artifact"])
 
 if __name__ == "__main__":
     main()
@@ -27,10 +27,23 @@ def unix_build(nginx_src, artifact_dir):
         err("make is not installed. Please install it and try again.")
         sys.exit(1)
 
+    autoconf_compiler_cache("nginx")
+
+    stamps = Path(nginx_src).parent / ".stamps"
+    source = subprocess.run(["git", "rev-parse", "HEAD"], cwd=nginx_src,
+                            capture_output=True, text=True).stdout.strip()
+
     configure_cmd = f"./configure --prefix={artifact_dir} --with-pcre --with-openssl --with-zlib"
-    run(configure_cmd, cwd=nginx_src)
-    run(f"make -j{os.cpu_count()}", cwd=nginx_src)
-    run("make install", cwd=nginx_src)
+    configured = incremental("nginx", "configure", stamps, [source, configure_cmd, toolchain_fingerprint()],
+                             lambda: run(configure_cmd, cwd=nginx_src),
+                             outputs=[os.path.join(nginx_src, "objs", "Makefile")])
+    compiled = incremental("nginx", "compile", stamps, [configured],
+                           lambda: run(f"make {jobs_flag()}", cwd=nginx_src),
+                           outputs=[os.path.join(nginx_src, "objs", "nginx")])
+    incremental("nginx", "install", stamps, [compiled],
+                lambda: run("make install", cwd=nginx_src),
+                outputs=[os.path.join(artifact_dir, "sbin", "nginx")])
+    report_compiler_cache("nginx")
     good(f"nginx built and installed locally at {artifact_dir}")
 
 def windows_build(nginx_src, artifact_dir):
@@ -0,0 +1,201 @@
+# Build several components at once and report where the time went.
+#
+#   uv run -m orchestrator [--pgo] [--profile NAME] [component ...]
+#
+# Every component runs in its own process (the builders chdir and set CFLAGS,
+# so they can't share one). Inside a component the phases form a chain
+# (resolve -> fetch -> configure -> compile -> install -> package) reported
+# through util.phase. Across components the only edges are the ones in
+# DEPENDS, so one component's downloads overlap with another's compile.
+# Upstream versions are resolved once up front by resolver.py.
+
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from util import *
+from resolver import resolve_plan
+
+if platform.system() == "Windows":
+    COMPONENTS = ["php", "caddy", "mariadb", "postgres"]
+else:
+    COMPONENTS = ["php", "apache", "mariadb", "postgres"]
+
+# component -> components that have to finish before it starts
+DEPENDS = {}
+
+_print_lock = threading.Lock()
+
+
+def fmt_duration(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    return f"{minutes}m{seconds:02d}s" if minutes else f"{seconds}s"
+
+
+def _build(name, phase_log):
+    env = os.environ.copy()
+    env["NINJA_PHASE_LOG"] = phase_log
+    env["NINJA_COMPONENT"] = name
+    env["TQDM_DISABLE"] = "1"  # interleaved progress bars are unreadable
+    env["PYTHONUNBUFFERED"] = "1"
+
+    start = time.time()
+    process = subprocess.Popen(
+        [sys.executable, "-m", f"{name}.main"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        env=env,
+        text=True,
+        errors="replace",
+    )
+    for line in process.stdout:
+        with _print_lock:
+            print(f"[{name}] {line}", end="")
+    process.wait()
+    return process.returncode, start, time.time()
+
+
+def _load_phases(phase_log):
+    phases = {}
+    if not os.path.exists(phase_log):
+        return phases
+    with open(phase_log, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            phases.setdefault(record["component"], []).append(record)
+    for records in phases.values():
+        records.sort(key=lambda r: r["start"])
+    return phases
+
+
+def critical_path(results, phases):
+    """Walk back from the last node to finish, always through the predecessor
+    that finished last. Nodes are (component, phase, start, end)."""
+    def nodes_of(name):
+        records = phases.get(name)
+        if records:
+            return [(name, r["phase"], r["start"], r["end"]) for r in records]
+        _, start, end = results[name]
+        return [(name, "build", start, end)]
+
+    finished = [name for name in results if results[name][0] == 0]
+    if not finished:
+        return []
+    name = max(finished, key=lambda n: results[n][2])
+    path = []
+    while name is not None:
+        path = nodes_of(name) + path
+        deps = [d for d in DEPENDS.get(name, []) if d in results]
+        name = max(deps, key=lambda d: results[d][2]) if deps else None
+    return path
+
+
+def summarize(results, phases, wall):
+    info("\n[SUMMARY]")
+    for name, (code, start, end) in sorted(results.items(), key=lambda kv: kv[1][2] - kv[1][1], reverse=True):
+        status = good if code == 0 else err
+        breakdown = ", ".join(f"{r['phase']} {fmt_duration(r['end'] - r['start'])}" for r in phases.get(name, []))
+        status(f"  {name:<10} {fmt_duration(end - start):>8}  {'ok' if code == 0 else f'failed ({code})'}  {breakdown}")
+
+    path = critical_path(results, phases)
+    if path:
+        total = sum(end - start for _, _, start, end in path)
+        info(f"\nCritical path ({fmt_duration(total)} of {fmt_duration(wall)} wall):")
+        for name, phase_name, start, end in path:
+            info(f"  {name:<10} {phase_name:<10} {fmt_duration(end - start):>8}")
+
+
+def main(components):
+    unknown = [c for c in components if c not in COMPONENTS and not os.path.isdir(c)]
+    if unknown:
+        raise RuntimeError(f"Unknown components: {', '.join(unknown)}")
+
+    fd, phase_log = tempfile.mkstemp(prefix="ninja-phases-", suffix=".jsonl")
+    os.close(fd)
+
+    # One CPU pool for every component; the fd keeps the FIFO's slots alive
+    jobserver_dir = None
+    if os.name != "nt":
+        jobserver_dir = tempfile.mkdtemp(prefix="ninja-jobserver-")
+        jobserver, jobserver_fd = create_jobserver(jobserver_dir, job_count())
+        os.environ["NINJA_JOBSERVER"] = jobserver
+        info(f"[JOBSERVER] {job_count()} slots shared by {', '.join(components)}")
+
+    # Resolve every upstream version in one concurrent pass, then let the
+    # builders read the pinned plan instead of each hitting the mirrors again
+    if not OFFLINE:
+        start = time.time()
+        plan, errors = resolve_plan(components)
+        info(f"[RESOLVE] {len(plan)} versions in {time.time() - start:.2f}s")
+        if not errors:
+            os.environ["NINJA_OFFLINE"] = "1"
+
+    pending = list(components)
+    results = {}
+    failed = set()
+    wall_start = time.time()
+
+    with ThreadPoolExecutor(max_workers=len(components)) as pool:
+        running = {}
+        while pending or running:
+            for name in list(pending):
+                deps = [d for d in DEPENDS.get(name, []) if d in components]
+                if any(d in failed for d in deps):
+                    warn(f"[SKIP] {name}: a dependency failed")
+                    pending.remove(name)
+                    failed.add(name)
+                elif all(d in results for d in deps):
+                    info(f"[START] {name}")
+                    pending.remove(name)
+                    running[pool.submit(_build, name, phase_log)] = name
+
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name] = future.result()
+                if results[name][0] == 0:
+                    good(f"[DONE] {name} in {fmt_duration(results[name][2] - results[name][1])}")
+                else:
+                    err(f"[FAILED] {name} (exit code {results[name][0]})")
+                    failed.add(name)
+
+    summarize(results, _load_phases(phase_log), time.time() - wall_start)
+    os.remove(phase_log)
+    if jobserver_dir:
+        os.close(jobserver_fd)
+        shutil.rmtree(jobserver_dir)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if "--pgo" in args:
+        # Builders pick it up from the environment (see util.PGO)
+        args.remove("--pgo")
+        os.environ["NINJA_PGO"] = "1"
+    if "--profile" in args or any(a.startswith("--profile=") for a in args):
+        # The builders read NINJA_PROFILE (see util.BUILD_PROFILE)
+        i = next(i for i, a in enumerate(args) if a.startswith("--profile"))
+        if "=" in args[i]:
+            profile = args.pop(i).split("=", 1)[1]
+        else:
+            profile = args[i + 1] if i + 1 < len(args) else ""
+            del args[i:i + 2]
+        if profile not in BUILD_PROFILES:
+            err(f"Unknown build profile {profile!r}, expected one of {', '.join(BUILD_PROFILES)}")
+            sys.exit(1)
+        os.environ["NINJA_PROFILE"] = profile
+    try:
+        sys.exit(main(args or COMPONENTS))
+    except Exception as e:
+        err(str(e))
+        sys.exit(1)
@@ -4,6 +4,23 @@ import subprocess
 import sys
 from pathlib import Path
 from util import *
+from shuriken import package
+
+PHP_VERSION = "8.5.4"
+PHP_RELEASES = "https://www.php.net/releases/index.php?json&version={version}"
+
+
+def parse_php_release(data):
+    """php.net release JSON -> [version, tarball, url, sha256] of the source tarball."""
+    tarball = f"php-{PHP_VERSION}.tar.gz"
+    source = next((s for s in data.get("source", []) if s["filename"] == tarball), None)
+    if source is None:
+        raise RuntimeError(f"{tarball} is not listed on php.net")
+    return [PHP_VERSION, tarball, f"https://www.php.net/distributions/{tarball}", source.get("sha256")]
+
+
+def get_php_release():
+    return parse_php_release(fetch_json(PHP_RELEASES.format(version=PHP_VERSION)))
 
 # ---------------------------------------
 
@@ -13,7 +30,7 @@ from util import *
 
 def project_paths():
     root = Path.cwd() / "php"
-    return {"root": root, "build": root / "build", "artifact": root / "artifact"}
+    return {"root": root, "build": root / build_dir_name(), "artifact": root / artifact_dir_name()}
 
 def prepare_dirs(paths):
     for p in paths.values():
@@ -21,18 +38,49 @@ def prepare_dirs(paths):
 
 # ---------------------------------------
 
+# PGO training
+
+# ---------------------------------------
+
+# The engine benchmarks shipped in the source tree, run once without and once
+# with OPcache so both execution paths are profiled
+TRAINING_SCRIPTS = ["Zend/bench.php", "Zend/micro_bench.php"]
+
+def train_php(php_src):
+    php = php_src / "sapi" / "cli" / "php"
+    for script in TRAINING_SCRIPTS:
+        if not (php_src / script).exists():
+            warn(f"[PGO] {script} is not in this PHP release, skipping it")
+            continue
+        for ini in ("", "-d opcache.enable_cli=1"):
+            run(f'"{php}" -n {ini} {script} > /dev/null', cwd=php_src)
+
+def pdo_pgsql_flag():
+    """--with-pdo-pgsql against the host's libpq. PostgreSQL is built in
+    parallel and its artifact only exists on the build machine, so PHP
+    never links against it. Without pg_config, PHP is built without the
+    driver."""
+    if shutil.which("pg_config"):
+        return "--with-pdo-pgsql"
+    warn("libpq not found (no pg_config), building PHP without pdo_pgsql")
+    return None
+
+# ---------------------------------------
+
 # Linux / macOS Builder
 
 # ---------------------------------------
 
-def build_php_unix(paths, php_version, php_tarball, php_url):
+def build_php_unix(paths, php_version, php_tarball, php_url, php_sha256):
     info(f"Downloading PHP source: {php_url}")
     build_dir = paths["build"]
-    download_file(php_url, str(build_dir / php_tarball))
-    extract_tarball(str(build_dir / php_tarball), dest=str(build_dir))
-
+    stamps = build_dir / ".stamps"
     php_src = build_dir / f"php-{php_version}"
 
+    source = incremental("php", "fetch", stamps, [php_url],
+                         lambda: download_and_extract(php_url, build_dir, build_dir / php_tarball, checksum=php_sha256),
+                         outputs=[php_src / "configure"])
+
     config_cmd = [
         "./configure",
         f"--prefix={paths['artifact']}",
@@ -41,18 +89,37 @@ def build_php_unix(paths, php_version, php_tarball, php_url):
         "--enable-mbstring",
         "--with-mysqli",
         "--with-pdo-mysql",
+        pdo_pgsql_flag(),
         "--with-openssl",
         "--with-zlib",
     ]
+    config_cmd = [flag for flag in config_cmd if flag]
+
+    autoconf_compiler_cache("php")
 
     info("Configuring PHP...")
-    run(" ".join(config_cmd), cwd=php_src)
+    configured = incremental("php", "configure", stamps, [source, config_cmd, toolchain_fingerprint()],
+                             lambda: run_configure(" ".join(config_cmd), cwd=php_src),
+                             outputs=[php_src / "Makefile"])
 
     info("Compiling...")
-    run(f"make -j{os.cpu_count()}", cwd=php_src)
+    # PHP's Makefile adds PROF_FLAGS to every compile and link (see make prof-gen)
+    compiled = pgo_compile("php", stamps, [configured],
+                           lambda flags: run(f'make {jobs_flag()} PROF_FLAGS="{flags}"', cwd=php_src),
+                           lambda: run("make clean", cwd=php_src),
+                           lambda: train_php(php_src),
+                           outputs=[php_src / "sapi" / "fpm" / "php-fpm"])
+
+    def install():
+        run("make install", cwd=php_src)
+        if build_profile()["debug"]:
+            split_debug_symbols(paths["artifact"], paths["root"] / "artifact-debug")
 
     info("Installing...")
-    run("make install", cwd=php_src)
+    incremental("php", "install", stamps, [compiled], install,
+                outputs=[paths["artifact"] / "sbin" / "php-fpm"])
+
+    report_compiler_cache("php")
 
     good(f"PHP installed at {paths['artifact']}")
 
@@ -64,7 +131,8 @@ def build_php_unix(paths, php_version, php_tarball, php_url):
 
 def build_php_windows(paths, php_version, php_zip, php_url):
     info("Installing PHP builder powershell module...")
-    run("powershell -Command ..\\windows_build.ps1", cwd=paths["build"])
+    with phase("php", "compile"):
+        run("powershell -Command ..\\windows_build.ps1", cwd=paths["build"])
 
     good(f"PHP installed at {paths['artifact']}")
     info(f"To use PHP, add {artifact_dir} to your PATH")
@@ -78,16 +146,17 @@ def build_php_windows(paths, php_version, php_zip, php_url):
 # ---------------------------------------
 
 def main():
-    php_version = "8.5.4"
     system = platform.system()
 
     paths = project_paths()
     prepare_dirs(paths)
+    apply_build_profile()
+
+    with phase("php", "resolve"):
+        php_version, php_tarball, php_url, php_sha256 = locked("php", get_php_release)
 
     if system in ("Linux", "Darwin"):
-        php_tarball = f"php-{php_version}.tar.gz"
-        php_url = f"https://www.php.net/distributions/{php_tarball}"
-        build_php_unix(paths, php_version, php_tarball, php_url)
+        build_php_unix(paths, php_version, php_tarball, php_url, php_sha256)
     elif system == "Windows":
         php_zip = f"php-{php_version}.zip"
         php_url = f"https://www.php.net/distributions/{php_zip}"
@@ -95,7 +164,11 @@ def main():
     else:
         raise RuntimeError(f"Unsupported OS: {system}")
         
-    shutil.copy2(paths["root"] / "scaffold" / "*", paths["artifact"])
+    with phase("php", "package"):
+        shutil.copytree(paths["root"] / "scaffold", paths["artifact"], dirs_exist_ok=True)
+        add_host_detection(paths["artifact"] / ".ninja" / "postinstall.ns")
+        write_forge("php", paths["artifact"])
+        package("php", paths["artifact"])
 
 # ---------------------------------------
 
@@ -0,0 +1,36 @@
+<?php
+// Set as opcache.preload by config.tmpl when the preload option is set.
+// PHP-FPM runs this once at startup: every script under the project is
+// compiled into shared memory and stays there until the next restart.
+// Classes whose parents are only known to the autoloader may be skipped with
+// a warning; that only costs the preload of those classes.
+//
+// The project and the excluded directories come from php.ini, so this file
+// ships as is and follows the options whenever the config is rendered again.
+
+$project = (string) get_cfg_var('ninja.preload');
+if ($project !== '' && $project[0] !== '/') {
+    $project = __DIR__ . '/' . $project;
+}
+$exclude = array_filter(explode(',', (string) get_cfg_var('ninja.preload_exclude')), 'strlen');
+
+if (is_file($project . '/vendor/autoload.php')) {
+    require_once $project . '/vendor/autoload.php';
+}
+
+$files = new RecursiveIteratorIterator(
+    new RecursiveCallbackFilterIterator(
+        new RecursiveDirectoryIterator($project, FilesystemIterator::SKIP_DOTS),
+        function ($file) use ($exclude) {
+            return !($file->isDir() && in_array($file->getFilename(), $exclude, true));
+        }
+    )
+);
+
+$compiled = 0;
+foreach ($files as $file) {
+    if ($file->isFile() && $file->getExtension() === 'php' && opcache_compile_file($file->getPathname())) {
+        $compiled++;
+    }
+}
+error_log("preload: compiled $compiled scripts from $project");
@@ -3,16 +3,18 @@ import platform
 import shutil
 import subprocess
 import re
+import socket
 import urllib.request
 import sys
+import tempfile
 
 from util import *
+from shuriken import package
 
 PG_BASE_URL = "https://ftp.postgresql.org/pub/source/"
 
 
-def get_latest_postgres():
-    html = urllib.request.urlopen(PG_BASE_URL).read().decode()
+def parse_postgres_index(html):
     # find strings like v18.1/, v17.7/, etc.
     versions = re.findall(r"v(\d+(?:\.\d+){1,2})/", html)
     # normalize versions to 3‑component tuples for sorting
@@ -28,12 +30,53 @@ def get_latest_postgres():
     tarball = f"postgresql-{latest}.tar.gz"
     url = f"{PG_BASE_URL}v{latest}/{tarball}"
     return latest, tarball, url
+
+
+def get_latest_postgres():
+    return parse_postgres_index(fetch_text(PG_BASE_URL))
+
+
+def train_postgres(pg_src_dir, artifact_dir):
+    """PGO workload: pgbench initialization, then select-only and TPC-B-like
+    runs against a scratch cluster of the instrumented build."""
+    if hasattr(os, "geteuid") and os.geteuid() == 0:
+        raise RuntimeError("initdb refuses to run as root; build with --pgo as a regular user")
+    scratch = tempfile.mkdtemp(prefix="ninja-pgo-")
+    try:
+        # The installation is relocatable, so DESTDIR is enough to keep it out of the artifact
+        run(f'make install DESTDIR="{scratch}"', cwd=pg_src_dir)
+        bindir = os.path.join(scratch + artifact_dir, "bin")
+        # The binaries' RUNPATH points at artifact_dir/lib, which does not
+        # exist yet on a first build and holds the previous libpq later on
+        libdir = os.path.join(scratch + artifact_dir, "lib")
+        env = dict(os.environ)
+        for var in ("LD_LIBRARY_PATH", "DYLD_LIBRARY_PATH"):
+            env[var] = os.pathsep.join(filter(None, [libdir, env.get(var)]))
+        data = os.path.join(scratch, "data")
+        log = os.path.join(scratch, "postgres.log")
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+
+        run(f'"{bindir}/initdb" -D "{data}" -U postgres -A trust > "{scratch}/initdb.log"', env=env)
+        run(f'"{bindir}/pg_ctl" -D "{data}" -l "{log}" -w '
+            f'-o "-p {port} -k {scratch} -c listen_addresses=\'\'" start', env=env)
+        try:
+            clients = max(2, job_count())
+            pgbench = f'"{bindir}/pgbench" -h "{scratch}" -p {port} -U postgres'
+            run(f"{pgbench} -i -s 20 -q postgres", env=env)
+            run(f"{pgbench} -S -c {clients} -j {clients} -T {PGO_SECONDS} postgres", env=env)
+            run(f"{pgbench} -c {clients} -j {clients} -T {PGO_SECONDS} postgres", env=env)
+        finally:
+            run(f'"{bindir}/pg_ctl" -D "{data}" -m fast -w stop', env=env)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
     
 def main():
     system = platform.system()
     project_root = os.path.abspath("./postgres")
-    build_dir = os.path.join(project_root, "build")
-    artifact_dir = os.path.join(project_root, "artifact", "postgres")
+    build_dir = os.path.join(project_root, build_dir_name())
+    artifact_dir = os.path.join(project_root, artifact_dir_name(), "postgres")
 
     os.makedirs(build_dir, exist_ok=True)
     os.makedirs(artifact_dir, exist_ok=True)
@@ -42,28 +85,56 @@ def main():
     info(f"Artifact directory: {artifact_dir}")
 
     os.chdir(build_dir)
+    profile = build_profile()
+    apply_build_profile()
 
     # Clone PostgreSQL source
     pg_src_dir = os.path.join(build_dir, "postgres")
-    pg_latest, pg_tarball, pg_url = get_latest_postgres()
-    info(f"Latest PostgreSQL: {pg_latest} -> {pg_tarball}")
-    download_file(pg_url, pg_tarball)
-    extract_tarball(pg_tarball)
-    shutil.move(strip_extension(pg_tarball), "postgres")
+    stamps = os.path.join(build_dir, ".stamps")
+    with phase("postgres", "resolve"):
+        pg_latest, pg_tarball, pg_url = locked("postgres", get_latest_postgres)
+        info(f"Latest PostgreSQL: {pg_latest} -> {pg_tarball}")
+
+    def fetch_source():
+        if os.path.exists(pg_src_dir):
+            shutil.rmtree(pg_src_dir)
+        download_and_extract(pg_url, build_dir, pg_tarball)
+        shutil.move(strip_extension(pg_tarball), "postgres")
+
+    source = incremental("postgres", "fetch", stamps, [pg_url], fetch_source,
+                         outputs=[os.path.join(pg_src_dir, "configure")])
 
     # Linux / macOS Build
     if system in ("Linux", "Darwin"):
         info(f"Configuring PostgreSQL on {system}")
 
-        os.environ["CFLAGS"] = "-O2 -Wall -std=gnu99 -pthread"
+        # Makefile.global adds COPT to CFLAGS at make time. Keeping it out of
+        # configure's CFLAGS lets postgres share the configure cache with PHP
+        # and Apache.
+        os.environ["COPT"] = "-Wall -std=gnu99 -pthread"
+        autoconf_compiler_cache("postgres")
 
         configure_cmd = (
             f"./configure --prefix={artifact_dir} --with-openssl --with-readline "
         )
 
-        run(configure_cmd, cwd=pg_src_dir)
-        run(f"make -j{os.cpu_count()}", cwd=pg_src_dir)
-        run("make install", cwd=pg_src_dir)
+        configured = incremental("postgres", "configure", stamps, [source, configure_cmd, toolchain_fingerprint()],
+                                 lambda: run_configure(configure_cmd, cwd=pg_src_dir),
+                                 outputs=[os.path.join(pg_src_dir, "GNUmakefile")])
+        # Makefile.global adds PROFILE to CFLAGS and LDFLAGS
+        compiled = pgo_compile("postgres", stamps, [configured],
+                               lambda flags: run(f'make {jobs_flag()} PROFILE="{flags}"', cwd=pg_src_dir),
+                               lambda: run("make clean", cwd=pg_src_dir),
+                               lambda: train_postgres(pg_src_dir, artifact_dir),
+                               outputs=[os.path.join(pg_src_dir, "src", "backend", "postgres")])
+        def install():
+            run("make install", cwd=pg_src_dir)
+            if profile["debug"]:
+                split_debug_symbols(artifact_dir, os.path.join(project_root, "artifact-debug", "postgres"))
+
+        incremental("postgres", "install", stamps, [compiled], install,
+                    outputs=[os.path.join(artifact_dir, "bin", "postgres")])
+        report_compiler_cache("postgres")
 
         good(f"PostgreSQL installed locally at {artifact_dir}")
 
@@ -144,18 +215,24 @@ def main():
         info("Building PostgreSQL using src/tools/msvc/build...")
 
         # Build everything
-        run("perl build.pl", cwd=msvc_dir)
+        with phase("postgres", "compile"):
+            run("perl build.pl", cwd=msvc_dir)
 
         # Install to artifact folder
-        run(f'perl build.pl install "{artifact_dir}"', cwd=msvc_dir)
+        with phase("postgres", "install"):
+            run(f'perl build.pl install "{artifact_dir}"', cwd=msvc_dir)
 
         good(f"PostgreSQL installed locally at {artifact_dir}")
 
     else:
         raise RuntimeError(f"Unsupported OS: {system}")
 
-    shutil.copy2("scaffold/.ninja", "artifact")
-    # install ninja and forge shuriken
+    with phase("postgres", "package"):
+        shutil.copytree(os.path.join(project_root, "scaffold", ".ninja"),
+                        os.path.join(artifact_dir, ".ninja"), dirs_exist_ok=True)
+        add_host_detection(os.path.join(artifact_dir, ".ninja", "postinstall.ns"))
+        write_forge("postgres", artifact_dir)
+        package("postgres", artifact_dir)
 
 
 if __name__ == "__main__":
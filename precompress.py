@@ -0,0 +1,133 @@
+# Precompress the static assets of a project for Caddy's file_server.
+#
+#   uv run -m precompress [--encodings zstd br gzip] [--min-size BYTES] DIR ...
+#
+# Every text-like file (see EXTENSIONS) gets .zst, .br and .gz sidecars next
+# to it, compressed once at the highest level, so `file_server { precompressed }`
+# can send them as-is instead of `encode` compressing on every request. gzip
+# uses zlib; zstd and brotli use the `zstd` and `brotli` command line tools and
+# are skipped when those are not installed. A sidecar that would not save at
+# least MIN_SAVING of the file is removed, so the server never sends a larger
+# encoding. The size and mtime of every source, and which encodings were
+# dropped, are kept in an index under CACHE_DIR, so a rerun only compresses
+# files that changed since (including ones replaced by an older copy).
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from util import *
+
+EXTENSIONS = {
+    ".html", ".htm", ".css", ".js", ".mjs", ".json", ".map", ".svg", ".xml",
+    ".txt", ".csv", ".md", ".wasm", ".ico", ".ttf", ".otf", ".eot", ".webmanifest",
+}
+MIN_SAVING = 0.1
+
+# encoding -> (sidecar suffix, command that compresses src to dest, or None for zlib)
+ENCODERS = {
+    "zstd": (".zst", lambda src, dest: ["zstd", "-q", "-f", "-19", str(src), "-o", str(dest)]),
+    "br": (".br", lambda src, dest: ["brotli", "-f", "-q", "11", str(src), "-o", str(dest)]),
+    "gzip": (".gz", None),
+}
+
+
+def _gzip(src, dest):
+    with open(src, "rb") as f_in, open(dest, "wb") as f_out:
+        # mtime=0 keeps the output identical across reruns
+        with gzip.GzipFile(filename="", mode="wb", fileobj=f_out, compresslevel=9, mtime=0) as gz:
+            shutil.copyfileobj(f_in, gz, 1 << 20)
+
+
+def index_path(root):
+    key = hashlib.sha256(str(Path(root).resolve()).encode()).hexdigest()[:16]
+    return CACHE_DIR / "precompress" / f"{key}.json"
+
+
+def compress_file(path, encodings, previous=None):
+    """Write the sidecars of one file. previous is its index entry from the
+    last run. Returns bytes saved per encoding and the new entry."""
+    stat = path.stat()
+    size = stat.st_size
+    entry = {"size": size, "mtime": stat.st_mtime_ns, "dropped": []}
+    unchanged = previous is not None and previous["size"] == size and previous["mtime"] == stat.st_mtime_ns
+    saved = {}
+    for encoding in encodings:
+        suffix, command = ENCODERS[encoding]
+        dest = path.with_name(path.name + suffix)
+        if unchanged and encoding in previous["dropped"]:
+            entry["dropped"].append(encoding)
+            continue
+        if not (unchanged and dest.exists()):
+            if command is None:
+                _gzip(path, dest)
+            else:
+                subprocess.run(command(path, dest), check=True, stdout=subprocess.DEVNULL)
+        if dest.stat().st_size > size * (1 - MIN_SAVING):
+            dest.unlink()
+            entry["dropped"].append(encoding)
+            continue
+        saved[encoding] = size - dest.stat().st_size
+    return saved, entry
+
+
+def find_assets(root, min_size):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".") and d != "node_modules"]
+        for name in filenames:
+            path = Path(dirpath) / name
+            if path.suffix.lower() in EXTENSIONS and not path.is_symlink() and path.stat().st_size >= min_size:
+                yield path
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="precompress", description="Write .zst/.br/.gz sidecars for static assets")
+    parser.add_argument("dirs", nargs="+", type=Path)
+    parser.add_argument("--encodings", nargs="+", choices=list(ENCODERS), default=list(ENCODERS))
+    parser.add_argument("--min-size", type=int, default=1024, help="skip smaller files (bytes)")
+    args = parser.parse_args(argv)
+
+    encodings = []
+    for encoding in args.encodings:
+        command = ENCODERS[encoding][1]
+        if command is not None and shutil.which(command("", "")[0]) is None:
+            warn(f"[PRECOMPRESS] {command('', '')[0]} not found, skipping {encoding}")
+        else:
+            encodings.append(encoding)
+
+    assets, results = [], []
+    with ThreadPoolExecutor(job_count()) as pool:
+        for d in args.dirs:
+            index = index_path(d)
+            previous = json.loads(index.read_text(encoding="utf-8")) if index.exists() else {}
+            found = list(find_assets(d, args.min_size))
+            done = list(pool.map(lambda path: compress_file(path, encodings, previous.get(path.relative_to(d).as_posix())),
+                                 found))
+            index.parent.mkdir(parents=True, exist_ok=True)
+            index.write_text(json.dumps({path.relative_to(d).as_posix(): entry for path, (_, entry) in zip(found, done)}),
+                             encoding="utf-8")
+            assets += found
+            results += [saved for saved, _ in done]
+
+    total = sum(path.stat().st_size for path in assets)
+    info(f"[PRECOMPRESS] {len(assets)} files, {total / 1024 ** 2:.1f}MiB")
+    for encoding in encodings:
+        files = sum(1 for r in results if encoding in r)
+        saved = sum(r.get(encoding, 0) for r in results)
+        good(f"  {encoding:<5} {files} sidecars, {saved / 1024 ** 2:.1f}MiB saved")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main(sys.argv[1:]))
+    except Exception as e:
+        err(str(e))
+        sys.exit(1)
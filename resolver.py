@@ -0,0 +1,163 @@
+# Resolve every upstream version and checksum at once.
+#
+#   uv run -m resolver [component ...]
+#
+# Each index (httpd, APR, PostgreSQL, MariaDB REST API, php.net, go.dev) is
+# fetched concurrently with asyncio and parsed once, using the same parsers
+# and the same metadata cache as the builders. Requests to one host share a
+# single keep-alive connection. The resulting plan is written to
+# versions.lock, so builders started with NINJA_OFFLINE=1 pick it up without
+# another round-trip; the orchestrator does exactly that.
+
+import asyncio
+import http.client
+import json
+import platform
+import sys
+import threading
+import urllib.error
+import urllib.parse
+
+from util import *
+from apache.main import APR_INDEX, HTTPD_INDEX, parse_apache_index, parse_apr_index
+from caddy.main import GO_RELEASES, parse_go_release
+from mariadb.main import MARIADB_API, lock_key, parse_artifact, parse_major_release
+from php.main import PHP_RELEASES, PHP_VERSION, parse_php_release
+from postgres.main import PG_BASE_URL, parse_postgres_index
+
+
+class HostPool:
+    """One keep-alive connection per host. Requests to the same host take
+    turns on it; different hosts run in parallel."""
+
+    def __init__(self, timeout=30):
+        self.timeout = timeout
+        self.connections = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def _connect(self, scheme, netloc):
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(netloc, timeout=self.timeout)
+
+    def get(self, url, headers, redirects=5):
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        with self.lock:
+            host_lock = self.locks.setdefault(key, threading.Lock())
+        with host_lock:
+            for attempt in range(2):
+                conn = self.connections.get(key) or self._connect(*key)
+                self.connections[key] = conn
+                try:
+                    conn.request("GET", path, headers=headers)
+                    response = conn.getresponse()
+                    body = response.read()
+                    break
+                except (http.client.HTTPException, OSError):
+                    # The server may have closed an idle keep-alive connection
+                    conn.close()
+                    del self.connections[key]
+                    if attempt:
+                        raise
+
+        response_headers = {k.lower(): v for k, v in response.getheaders()}
+        if response.status in (301, 302, 303, 307, 308) and redirects:
+            return self.get(urllib.parse.urljoin(url, response_headers["location"]), headers, redirects - 1)
+        if response.status >= 400:
+            raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, None)
+        return response.status, response_headers, body
+
+    def close(self):
+        for conn in self.connections.values():
+            conn.close()
+
+
+async def _text(pool, url):
+    return await asyncio.to_thread(fetch_text, url, None, pool.get)
+
+
+async def _json(pool, url):
+    return json.loads(await _text(pool, url))
+
+
+async def _httpd(pool):
+    return {"httpd": list(parse_apache_index(await _text(pool, HTTPD_INDEX)))}
+
+
+async def _apr(pool):
+    # One index page holds both APR and APR-util
+    apr, apr_util = parse_apr_index(await _text(pool, APR_INDEX))
+    return {"apr": [list(apr), list(apr_util)]}
+
+
+async def _postgres(pool):
+    return {"postgres": list(parse_postgres_index(await _text(pool, PG_BASE_URL)))}
+
+
+async def _mariadb(pool):
+    major = parse_major_release(await _json(pool, MARIADB_API))
+    return {lock_key(): list(parse_artifact(await _json(pool, f"{MARIADB_API}{major}/")))}
+
+
+async def _php(pool):
+    return {"php": parse_php_release(await _json(pool, PHP_RELEASES.format(version=PHP_VERSION)))}
+
+
+async def _go(pool):
+    system, arch = get_system_arch()
+    return {f"go-{system}-{arch}": parse_go_release(await _json(pool, GO_RELEASES), system, arch)}
+
+
+# component -> resolvers it needs
+RESOLVERS = {
+    "apache": [_httpd, _apr],
+    "postgres": [_postgres],
+    "mariadb": [_mariadb] if platform.system() in ("Windows", "Linux") else [],
+    "php": [_php],
+    "caddy": [_go],
+}
+
+
+async def resolve_all(components):
+    """Resolve everything the given components need. Returns (plan, errors)."""
+    pool = HostPool()
+    tasks = [r for component in components for r in RESOLVERS.get(component, [])]
+    tasks = list(dict.fromkeys(tasks))
+    try:
+        results = await asyncio.gather(*(resolver(pool) for resolver in tasks), return_exceptions=True)
+    finally:
+        pool.close()
+
+    plan, errors = {}, {}
+    for resolver, result in zip(tasks, results):
+        if isinstance(result, Exception):
+            errors[resolver.__name__.lstrip("_")] = result
+        else:
+            plan.update(result)
+    return plan, errors
+
+
+def resolve_plan(components):
+    """Resolve concurrently and pin the results in versions.lock."""
+    plan, errors = asyncio.run(resolve_all(components))
+    for name, value in plan.items():
+        locked(name, lambda value=value: value)
+    for name, e in errors.items():
+        err(f"[RESOLVE FAILED] {name}: {e}")
+    return plan, errors
+
+
+if __name__ == "__main__":
+    components = sys.argv[1:] or list(RESOLVERS)
+    start = time.time()
+    plan, errors = resolve_plan(components)
+    for name, value in sorted(plan.items()):
+        good(f"  {name:<24} {json.dumps(value)}")
+    info(f"Resolved {len(plan)} entries in {time.time() - start:.2f}s")
+    sys.exit(1 if errors else 0)
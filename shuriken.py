@@ -0,0 +1,564 @@
+# Package an artifact directory as a .shuriken.
+#
+#   uv run -m shuriken pack COMPONENT [ARTIFACT_DIR]
+#   uv run -m shuriken verify FILE.shuriken
+#   uv run -m shuriken bench ARTIFACT_DIR
+#   uv run -m shuriken delta OLD.shuriken NEW.shuriken
+#   uv run -m shuriken apply FILE.shuriken-delta INSTALL_DIR
+#   uv run -m shuriken delta-bench OLD.shuriken NEW.shuriken
+#
+# A .shuriken is a tar archive compressed with zstd. It is reproducible:
+# entries are sorted, owners are root, mtimes are SOURCE_DATE_EPOCH (or 0)
+# and modes are reduced to 0644/0755, so packaging the same tree twice gives
+# the same bytes. zstd runs multithreaded; its output does not depend on the
+# thread count, only on the level and the zstd version.
+#
+# Next to <name>.shuriken goes <name>.shuriken.json with the archive's size
+# and sha256, the forge.json metadata and every file's size, mode and sha256.
+# The file list is also stored in the archive as .ninja/files.json, so an
+# installed shuriken can be verified without the registry. Its sha256 is the
+# tree id, which names the exact build an installation came from.
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import tomllib
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from util import *
+
+ROOT = Path(__file__).resolve().parent
+DIST_DIR = Path(os.environ.get("NINJA_DIST_DIR", ROOT / "dist"))
+LEVEL = int(os.environ.get("NINJA_SHURIKEN_LEVEL", 9))
+MTIME = int(os.environ.get("SOURCE_DATE_EPOCH", 0))
+FILES_JSON = ".ninja/files.json"
+# Long-distance matching finds repeats across the whole archive; 2^27 is the
+# largest window decoders accept without extra flags
+ZSTD_FLAGS = ["--long=27"]
+DELTAS = os.environ.get("NINJA_SHURIKEN_DELTAS", "1") != "0"
+
+
+def zstd_bin():
+    zstd = shutil.which("zstd")
+    if zstd is None:
+        raise RuntimeError("zstd not found; install it (apt install zstd, brew install zstd, winget install Meta.Zstandard)")
+    return zstd
+
+
+def sha256_file(path):
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def walk_tree(root):
+    """Relative posix paths of every directory, file and symlink under root, sorted."""
+    entries = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        rel_dir = Path(dirpath).relative_to(root)
+        entries += [(rel_dir / name).as_posix() for name in dirnames + filenames]
+    return sorted(e for e in entries if e != FILES_JSON)
+
+
+def describe(root, rel):
+    """File list entry of root/rel, None if it does not exist."""
+    path = Path(root) / rel
+    if path.is_symlink():
+        return {"path": rel, "link": os.readlink(path)}
+    if not path.is_file():
+        return None
+    mode = 0o755 if os.stat(path).st_mode & 0o111 else 0o644
+    return {"path": rel, "size": path.stat().st_size, "mode": mode, "sha256": sha256_file(path)}
+
+
+def file_manifest(root):
+    """[{path, size, mode, sha256} or {path, link}] for every file under root."""
+    root = Path(root)
+    files = [p for p in walk_tree(root) if (root / p).is_symlink() or not (root / p).is_dir()]
+    # hashlib releases the GIL, so threads hash in parallel
+    with ThreadPoolExecutor(job_count()) as pool:
+        return list(pool.map(lambda rel: describe(root, rel), files))
+
+
+def files_json(files):
+    return json.dumps({"files": files}, indent=1, sort_keys=True).encode()
+
+
+def tree_id(files):
+    return hashlib.sha256(files_json(files)).hexdigest()
+
+
+def _tarinfo(name, kind, size=0, mode=0o644, link=""):
+    ti = tarfile.TarInfo(name)
+    ti.type, ti.size, ti.mode, ti.linkname = kind, size, mode, link
+    ti.mtime, ti.uid, ti.gid, ti.uname, ti.gname = MTIME, 0, 0, "", ""
+    return ti
+
+
+def pack(root, dest):
+    """Write root to dest as a reproducible .shuriken. Returns the file list."""
+    root, dest = Path(root), Path(dest)
+    files = file_manifest(root)
+    by_path = {f["path"]: f for f in files}
+    listing = files_json(files)
+
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(dest.name + ".tmp")
+    zstd = subprocess.Popen([zstd_bin(), "-q", "-f", f"-{min(LEVEL, 19)}", f"-T{job_count()}", *ZSTD_FLAGS,
+                             "-o", str(tmp)], stdin=subprocess.PIPE)
+    try:
+        with tarfile.open(fileobj=zstd.stdin, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+            for rel in walk_tree(root):
+                entry = by_path.get(rel)
+                if entry is None:
+                    tar.addfile(_tarinfo(rel, tarfile.DIRTYPE, mode=0o755))
+                elif "link" in entry:
+                    tar.addfile(_tarinfo(rel, tarfile.SYMTYPE, mode=0o777, link=entry["link"]))
+                else:
+                    with open(root / rel, "rb") as f:
+                        tar.addfile(_tarinfo(rel, tarfile.REGTYPE, entry["size"], entry["mode"]), f)
+            tar.addfile(_tarinfo(FILES_JSON, tarfile.REGTYPE, len(listing)), io.BytesIO(listing))
+    finally:
+        zstd.stdin.close()
+        if zstd.wait() != 0:
+            raise RuntimeError(f"zstd failed writing {dest}")
+    os.replace(tmp, dest)
+    return files
+
+
+def unpack(archive, dest):
+    """Extract a .shuriken into dest. Returns its file list."""
+    zstd = subprocess.Popen([zstd_bin(), "-q", "-d", "-c", *ZSTD_FLAGS, str(archive)], stdout=subprocess.PIPE)
+    try:
+        with tarfile.open(fileobj=zstd.stdout, mode="r|") as tar:
+            tar.extractall(dest, filter="tar")
+    finally:
+        zstd.stdout.close()
+        if zstd.wait() != 0:
+            raise RuntimeError(f"zstd failed reading {archive}")
+    with open(Path(dest) / FILES_JSON, "r", encoding="utf-8") as f:
+        return json.load(f)["files"]
+
+
+def verify_tree(root, files):
+    """Names of the files under root that differ from the file list."""
+    expected = {f["path"]: f for f in files}
+    actual = {f["path"]: f for f in file_manifest(root)}
+    return sorted(p for p in expected.keys() | actual.keys() if expected.get(p) != actual.get(p))
+
+
+def zstd_version():
+    return subprocess.run([zstd_bin(), "-V"], capture_output=True, text=True).stdout.strip()
+
+
+def package(component, artifact_dir):
+    """Pack artifact_dir as dist/<artifact name>.shuriken and write its
+    manifest, plus a delta from the archive it replaces. Returns the archive
+    path."""
+    forge_path = Path(artifact_dir) / "forge.json"
+    forge = json.loads(forge_path.read_text(encoding="utf-8")) if forge_path.exists() else {}
+    name = artifact_name(component, forge.get("profile"))
+    archive = DIST_DIR / f"{name}.shuriken"
+    # The old archive is only moved aside once the new one is complete, so a
+    # failed build leaves dist/ as it was
+    fresh = archive.with_name(archive.name + ".new")
+    start = time.time()
+    files = pack(artifact_dir, fresh)
+    previous = None
+    if DELTAS and archive.exists():
+        previous = archive.with_name(archive.name + ".prev")
+        os.replace(archive, previous)
+    os.replace(fresh, archive)
+
+    size = sum(f.get("size", 0) for f in files)
+    manifest = {
+        "id": component,
+        "name": name,
+        "version": forge.get("version"),
+        "platform": forge_platform(forge.get("profile")),
+        "profile": forge.get("profile", BUILD_PROFILE),
+        "archive": archive.name,
+        "size": archive.stat().st_size,
+        "sha256": sha256_file(archive),
+        "unpacked_size": size,
+        "tree": tree_id(files),
+        "zstd": zstd_version(),
+        "files": files,
+    }
+    with open(archive.with_name(archive.name + ".json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+        f.write("\n")
+    good(f"[PACKAGE] {archive.name}: {len(files)} files, {size / 1024 ** 2:.1f}MiB -> "
+         f"{manifest['size'] / 1024 ** 2:.1f}MiB in {time.time() - start:.1f}s")
+    if previous is not None:
+        try:
+            if sha256_file(previous) != manifest["sha256"]:
+                make_delta(previous, archive)
+        finally:
+            previous.unlink()
+    return archive
+
+
+def verify(archive):
+    """Check a .shuriken against its manifest and unpack it to check every file."""
+    manifest_path = Path(archive).with_name(Path(archive).name + ".json")
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if sha256_file(archive) != manifest["sha256"]:
+            raise RuntimeError(f"{archive} does not match the sha256 in {manifest_path.name}")
+    with tempfile.TemporaryDirectory(prefix="ninja-verify-") as scratch:
+        files = unpack(archive, scratch)
+        bad = verify_tree(scratch, files)
+    if bad:
+        raise RuntimeError(f"{len(bad)} files differ from {FILES_JSON}: {', '.join(bad[:10])}")
+    good(f"[VERIFY] {Path(archive).name}: {len(files)} files ok")
+
+
+def bench(artifact_dir):
+    """Pack artifact_dir with tar.gz and with zstd, then unpack both."""
+    with tempfile.TemporaryDirectory(prefix="ninja-pack-bench-") as scratch:
+        scratch = Path(scratch)
+        results = []
+
+        start = time.time()
+        with tarfile.open(scratch / "artifact.tar.gz", "w:gz", compresslevel=6) as tar:
+            tar.add(artifact_dir, arcname=".")
+        packed = time.time() - start
+        start = time.time()
+        with tarfile.open(scratch / "artifact.tar.gz", "r:gz") as tar:
+            tar.extractall(scratch / "gz", filter="tar")
+        results.append(("gzip -6", packed, time.time() - start, (scratch / "artifact.tar.gz").stat().st_size))
+
+        start = time.time()
+        pack(artifact_dir, scratch / "artifact.shuriken")
+        packed = time.time() - start
+        start = time.time()
+        unpack(scratch / "artifact.shuriken", scratch / "zstd")
+        results.append((f"zstd -{min(LEVEL, 19)} -T{job_count()}", packed, time.time() - start,
+                        (scratch / "artifact.shuriken").stat().st_size))
+
+    info(f"  {'format':<16} {'pack':>8} {'unpack':>8} {'size':>10}")
+    for name, packed, unpacked, size in results:
+        info(f"  {name:<16} {packed:>7.1f}s {unpacked:>7.1f}s {size / 1024 ** 2:>8.1f}MiB")
+
+
+# ----------------------------
+# Delta updates
+# ----------------------------
+# <name>.from-<tree id>.shuriken-delta turns an installation of an older
+# build into the current one. It is a plain tar of delta.json and one zstd
+# stream per file that changed: with --patch-from the old file when the path
+# existed before, on its own otherwise. Unchanged files, and files that only
+# moved (matched by hash), come from the installed tree. A client looks up
+# the delta for the sha256 of its .ninja/files.json and downloads the full
+# archive when there is none. Deltas chain: each build leaves one from the
+# build before it.
+DELTA_FLAGS = ["--long=31"]  # a patch can reference anything in the old file
+# Deltas are made once and downloaded by every host, so they get the top level
+DELTA_LEVEL = int(os.environ.get("NINJA_DELTA_LEVEL", 19))
+MAX_DELTA_RATIO = 0.9
+# Files rewritten in place after install: host.ns fills the host's values into
+# options.toml and the ninja manager renders config.tmpl over the manifest's
+# config-path. Their installed copies are never patched or checked; the delta
+# carries the new build's copy in full and the old one as the merge base.
+OPTIONS_TOML = ".ninja/options.toml"
+
+
+def mutable_files(root):
+    """Packaged files under root that the installer or the user rewrite."""
+    root = Path(root)
+    paths = [OPTIONS_TOML]
+    manifest = root / ".ninja" / "manifest.toml"
+    if manifest.exists():
+        config = tomllib.loads(manifest.read_text(encoding="utf-8")).get("config", {})
+        if config.get("config-path"):
+            paths.append(Path(config["config-path"]).as_posix())
+    return sorted(p for p in set(paths) if (root / p).is_file() and not (root / p).is_symlink())
+
+
+def _toml_keys(text):
+    """(table, key) -> line for every `key = value` line of a flat options.toml."""
+    keys, table = {}, ""
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("["):
+            table = stripped
+        elif "=" in stripped and not stripped.startswith("#"):
+            keys[(table, stripped.split("=", 1)[0].strip())] = line
+    return keys
+
+
+def merge_options(base, installed, new):
+    """The new options.toml with every value the installed copy changed from
+    base (the old build's copy) kept, including keys added to a table."""
+    base_keys, installed_keys, new_keys = _toml_keys(base), _toml_keys(installed), _toml_keys(new)
+    changed = {k: line for k, line in installed_keys.items() if base_keys.get(k) != line}
+    out, table = [], ""
+
+    def flush():
+        out.extend(line for k, line in changed.items() if k[0] == table and k not in new_keys)
+
+    for line in new.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("["):
+            flush()
+            table = stripped
+        elif "=" in stripped and not stripped.startswith("#"):
+            line = changed.get((table, stripped.split("=", 1)[0].strip()), line)
+        out.append(line)
+    flush()
+    return "\n".join(out) + "\n"
+
+
+def delta_plan(old_files, new_files, mutable=()):
+    """path -> how to make it from an installation of old_files, for every
+    regular file in new_files. Mutable files always come in full."""
+    old = {f["path"]: f for f in old_files}
+    by_hash = {f["sha256"]: f["path"] for f in old_files if "sha256" in f and f["path"] not in mutable}
+    plan = {}
+    for f in new_files:
+        if "link" in f:
+            continue
+        prev = old.get(f["path"])
+        if f["path"] in mutable:
+            plan[f["path"]] = {"op": "add"}
+        elif prev == f:
+            plan[f["path"]] = {"op": "keep"}
+        elif f["sha256"] in by_hash:
+            plan[f["path"]] = {"op": "copy", "from": by_hash[f["sha256"]]}
+        elif prev is not None and "sha256" in prev:
+            plan[f["path"]] = {"op": "patch"}
+        else:
+            plan[f["path"]] = {"op": "add"}
+    return plan
+
+
+def delta_name(archive, from_tree):
+    return f"{Path(archive).name.removesuffix('.shuriken')}.from-{from_tree[:16]}.shuriken-delta"
+
+
+def make_delta(old_archive, new_archive, max_ratio=MAX_DELTA_RATIO):
+    """Write the delta from old_archive to new_archive next to new_archive.
+    Returns its path, or None when it would not save enough over the full
+    archive."""
+    start = time.time()
+    with tempfile.TemporaryDirectory(prefix="ninja-delta-") as scratch:
+        scratch = Path(scratch)
+        old_files = unpack(old_archive, scratch / "old")
+        new_files = unpack(new_archive, scratch / "new")
+        mutable = mutable_files(scratch / "new")
+        plan = delta_plan(old_files, new_files, mutable)
+        spec = {
+            "from": tree_id(old_files),
+            "to": tree_id(new_files),
+            "archive": Path(new_archive).name,
+            "dirs": [p for p in walk_tree(scratch / "new")
+                     if (scratch / "new" / p).is_dir() and not (scratch / "new" / p).is_symlink()],
+            "files": new_files,
+            "plan": plan,
+            "mutable": mutable,
+        }
+        bases = [rel for rel in mutable if (scratch / "old" / rel).is_file()]
+
+        def encode(rel):
+            out = scratch / "data" / f"{rel}.zst"
+            out.parent.mkdir(parents=True, exist_ok=True)
+            patch = [f"--patch-from={scratch / 'old' / rel}"] if plan[rel]["op"] == "patch" else []
+            subprocess.run([zstd_bin(), "-q", "-f", f"-{min(DELTA_LEVEL, 19)}", *DELTA_FLAGS, *patch,
+                            str(scratch / "new" / rel), "-o", str(out)], check=True)
+
+        changed = sorted(p for p, step in plan.items() if step["op"] in ("patch", "add"))
+        with ThreadPoolExecutor(job_count()) as pool:
+            list(pool.map(encode, changed))
+
+        dest = Path(new_archive).with_name(delta_name(new_archive, spec["from"]))
+        spec_json = json.dumps(spec, indent=1, sort_keys=True).encode()
+        with tarfile.open(dest, "w", format=tarfile.PAX_FORMAT) as tar:
+            tar.addfile(_tarinfo("delta.json", tarfile.REGTYPE, len(spec_json)), io.BytesIO(spec_json))
+            for rel in changed:
+                data = scratch / "data" / f"{rel}.zst"
+                with open(data, "rb") as f:
+                    tar.addfile(_tarinfo(f"data/{rel}.zst", tarfile.REGTYPE, data.stat().st_size), f)
+            for rel in bases:
+                data = scratch / "old" / rel
+                with open(data, "rb") as f:
+                    tar.addfile(_tarinfo(f"base/{rel}", tarfile.REGTYPE, data.stat().st_size), f)
+
+    size, full = dest.stat().st_size, Path(new_archive).stat().st_size
+    if max_ratio is not None and size > full * max_ratio:
+        warn(f"[DELTA] {dest.name} would be {size / full:.0%} of the full archive, not publishing it")
+        dest.unlink()
+        return None
+    counts = {op: sum(1 for s in plan.values() if s["op"] == op) for op in ("keep", "copy", "patch", "add")}
+    good(f"[DELTA] {dest.name}: {size / 1024 ** 2:.1f}MiB instead of {full / 1024 ** 2:.1f}MiB "
+         f"({', '.join(f'{n} {op}' for op, n in counts.items())}) in {time.time() - start:.1f}s")
+    return dest
+
+
+def apply_delta(delta, root):
+    """Update the shuriken installed at root with a delta. The new tree is
+    built next to root and every file is checked against the delta's file
+    list before it replaces the old one. Files that are not part of the
+    shuriken (data, logs, generated configs) are carried over, and so are
+    local changes to the mutable files: options.toml is merged, any other
+    changed file is kept with the new build's copy next to it as <name>.new."""
+    root = Path(root).resolve()
+    with tempfile.TemporaryDirectory(prefix=f".{root.name}-update-", dir=root.parent) as scratch:
+        scratch = Path(scratch)
+        with tarfile.open(delta, "r:") as tar:
+            tar.extractall(scratch / "delta", filter="data")
+        spec = json.loads((scratch / "delta" / "delta.json").read_text(encoding="utf-8"))
+        installed = root / FILES_JSON
+        if not installed.exists() or sha256_file(installed) != spec["from"]:
+            raise RuntimeError(f"{Path(delta).name} does not apply to {root}; install {spec['archive']} instead")
+
+        new = scratch / "new"
+        for rel in spec["dirs"]:
+            (new / rel).mkdir(parents=True, exist_ok=True)
+
+        def build(f):
+            rel, path = f["path"], new / f["path"]
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if "link" in f:
+                os.symlink(f["link"], path)
+                return
+            step = spec["plan"][rel]
+            if step["op"] in ("keep", "copy"):
+                shutil.copyfile(root / step.get("from", rel), path)
+            else:
+                patch = [f"--patch-from={root / rel}"] if step["op"] == "patch" else []
+                subprocess.run([zstd_bin(), "-q", "-d", "-f", *DELTA_FLAGS, *patch,
+                                str(scratch / "delta" / "data" / f"{rel}.zst"), "-o", str(path)], check=True)
+            os.chmod(path, f["mode"])
+
+        try:
+            with ThreadPoolExecutor(job_count()) as pool:
+                list(pool.map(build, spec["files"]))
+        except subprocess.CalledProcessError:
+            raise RuntimeError(f"a file did not reconstruct, {root} is unchanged; install {spec['archive']} instead")
+        (new / FILES_JSON).parent.mkdir(parents=True, exist_ok=True)
+        (new / FILES_JSON).write_bytes(files_json(spec["files"]))
+
+        with ThreadPoolExecutor(job_count()) as pool:
+            actual = list(pool.map(lambda f: describe(new, f["path"]), spec["files"]))
+        bad = [f["path"] for f, a in zip(spec["files"], actual) if f != a]
+        if bad or sha256_file(new / FILES_JSON) != spec["to"]:
+            raise RuntimeError(f"{len(bad)} files did not reconstruct ({', '.join(bad[:10])}); "
+                               f"{root} is unchanged, install {spec['archive']} instead")
+
+        old_files = {f["path"]: f for f in json.loads(installed.read_text(encoding="utf-8"))["files"]}
+        for rel in spec.get("mutable", []):
+            if describe(root, rel) in (None, old_files.get(rel)):
+                continue  # not installed or untouched, the new build's copy wins
+            local = (root / rel).read_text(encoding="utf-8", errors="surrogateescape")
+            base = scratch / "delta" / "base" / rel
+            if rel == OPTIONS_TOML and base.exists():
+                merged = merge_options(base.read_text(encoding="utf-8"), local,
+                                       (new / rel).read_text(encoding="utf-8"))
+                (new / rel).write_text(merged, encoding="utf-8")
+            else:
+                os.replace(new / rel, new / f"{rel}.new")
+                shutil.copy2(root / rel, new / rel)
+                warn(f"[APPLY] kept the local {rel}, the new one is {rel}.new")
+
+        # Untracked entries are moved, not copied: the scratch directory is on
+        # the same filesystem, and a data directory may be large or in use.
+        # Whole untracked directories move at once.
+        target = {f["path"] for f in spec["files"]}
+        moved = []
+        try:
+            for rel in walk_tree(root):
+                if rel in old_files or rel in target or (new / rel).exists() or not os.path.lexists(root / rel):
+                    continue
+                (new / rel).parent.mkdir(parents=True, exist_ok=True)
+                os.replace(root / rel, new / rel)
+                moved.append(rel)
+            os.replace(root, scratch / "old")
+            try:
+                os.replace(new, root)
+            except OSError:
+                os.replace(scratch / "old", root)
+                raise
+        except OSError:
+            for rel in reversed(moved):
+                os.replace(new / rel, root / rel)
+            raise
+    good(f"[APPLY] {root} updated to {spec['archive']} ({len(spec['files'])} files verified)")
+
+
+def delta_bench(old_archive, new_archive):
+    """Bytes saved and time spent by a delta compared to the full archive."""
+    with tempfile.TemporaryDirectory(prefix="ninja-delta-bench-") as scratch:
+        scratch = Path(scratch)
+        shutil.copy2(new_archive, scratch / Path(new_archive).name)
+        new_archive = scratch / Path(new_archive).name
+
+        start = time.time()
+        delta = make_delta(old_archive, new_archive, max_ratio=None)
+        generated = time.time() - start
+
+        start = time.time()
+        unpack(new_archive, scratch / "full")
+        full_install = time.time() - start
+
+        unpack(old_archive, scratch / "installed")
+        start = time.time()
+        apply_delta(delta, scratch / "installed")
+        applied = time.time() - start
+
+        full, size = new_archive.stat().st_size, delta.stat().st_size
+    info(f"  full archive {full / 1024 ** 2:>9.1f}MiB  install {full_install:.1f}s")
+    info(f"  delta        {size / 1024 ** 2:>9.1f}MiB  apply   {applied:.1f}s  generate {generated:.1f}s")
+    good(f"  {1 - size / full:.1%} fewer bytes to download")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="shuriken", description="Build and check .shuriken archives")
+    commands = parser.add_subparsers(dest="command", required=True)
+    p = commands.add_parser("pack", help="package a component's artifact into dist/")
+    p.add_argument("component")
+    p.add_argument("artifact", nargs="?", type=Path, help="artifact directory (default: <component>/artifact, or artifact-<profile>)")
+    p = commands.add_parser("verify", help="check an archive against its manifest")
+    p.add_argument("archive", type=Path)
+    p = commands.add_parser("bench", help="compare tar.gz and zstd packing of a directory")
+    p.add_argument("artifact", type=Path)
+    for name, help in (("delta", "write the delta from OLD to NEW next to NEW"),
+                       ("delta-bench", "measure a delta between two consecutive archives")):
+        p = commands.add_parser(name, help=help)
+        p.add_argument("old", type=Path)
+        p.add_argument("new", type=Path)
+    p = commands.add_parser("apply", help="update an installed shuriken with a delta")
+    p.add_argument("delta", type=Path)
+    p.add_argument("root", type=Path)
+    args = parser.parse_args(argv)
+
+    if args.command == "pack":
+        package(args.component, args.artifact or ROOT / args.component / artifact_dir_name())
+    elif args.command == "verify":
+        verify(args.archive)
+    elif args.command == "bench":
+        bench(args.artifact)
+    elif args.command == "delta":
+        make_delta(args.old, args.new)
+    elif args.command == "apply":
+        apply_delta(args.delta, args.root)
+    else:
+        delta_bench(args.old, args.new)
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main(sys.argv[1:]))
+    except Exception as e:
+        err(str(e))
+        sys.exit(1)
@@ -0,0 +1,646 @@
+# Measure how fast the built daemons come up.
+#
+#   uv run -m startup [--runs N] [--json FILE] [--drop-caches] [component ...]
+#
+# Each daemon (caddy, php-fpm, mariadb, postgres) is started from its
+# artifact directory with its config.tmpl rendered for a scratch instance on
+# free loopback ports. Two times are taken from exec: the first accepted TCP
+# connection, and the first successful request (an HTTP response, a FastCGI
+# management reply, or SELECT 1). Cold runs use a fresh instance each time
+# (data directories are initialized first, untimed); warm runs restart one
+# primed instance. With --drop-caches (Linux, root) the page cache is dropped
+# before every cold run as well.
+
+import argparse
+import getpass
+import http.client
+import json
+import math
+import os
+import platform
+import re
+import shutil
+import signal
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import tomllib
+
+from pathlib import Path
+from util import *
+
+ROOT = Path(__file__).resolve().parent
+EXE = ".exe" if os.name == "nt" else ""
+TIMEOUT = float(os.environ.get("NINJA_STARTUP_TIMEOUT", 60))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def artifact_dir(component):
+    artifact = ROOT / component / artifact_dir_name()
+    if component == "postgres" and (artifact / "postgres").is_dir():
+        return artifact / "postgres"
+    if component == "mariadb" and not (artifact / "bin").is_dir():
+        # The Linux/Windows prebuilt is extracted into build/
+        found = sorted((ROOT / "mariadb" / "build").glob("mariadb-*/bin"))
+        if found:
+            return found[-1].parent
+    return artifact
+
+
+def connect(state, timeout):
+    """Connect to a daemon's unix socket if it has one, else to its port."""
+    if state.get("socket"):
+        s = socket.socket(socket.AF_UNIX)
+        s.settimeout(timeout)
+        try:
+            s.connect(str(state["socket"]))
+        except OSError:
+            s.close()
+            raise
+        return s
+    return socket.create_connection(("127.0.0.1", state["port"]), timeout=timeout)
+
+
+def accepts(state):
+    try:
+        with connect(state, 0.2):
+            return True
+    except OSError:
+        return False
+
+
+def quiet(cmd, timeout=5):
+    try:
+        return subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=timeout).returncode == 0
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+
+
+# ----------------------------
+# Shuriken templates
+# ----------------------------
+# The ninja manager renders each shuriken's .ninja/config.tmpl (Tera) with
+# the values from options.toml when it is installed. The benchmarks here need
+# the same configs for their scratch instances, so render_template covers the
+# part of Tera the scaffolds use: {{ expr | filter }}, {% if/elif/else %},
+# {% for %}, {% set %} and the path() function. Expressions are evaluated as
+# Python, which matches Tera for literals, arithmetic, comparisons,
+# and/or/not and `in`. tests/test_templates.py renders every shipped .tmpl,
+# so a template that starts using more of Tera fails there first.
+_TEMPLATE_TAGS = re.compile(r"({{.*?}}|{%.*?%}|{#.*?#})", re.S)
+_TEMPLATE_RAW = re.compile(r"{%-?\s*raw\s*-?%}(.*?){%-?\s*endraw\s*-?%}", re.S)
+
+_TEMPLATE_FILTERS = {
+    "int": lambda v: int(float(v)),
+    "float": float,
+    "round": lambda v, method="common", precision=0: (
+        {"floor": math.floor, "ceil": math.ceil}.get(method, lambda x: x)(v * 10 ** precision) if method != "common"
+        else math.floor(v * 10 ** precision + 0.5)) / 10 ** precision,
+    "default": lambda v, value=None: value if v is None else v,
+    "lower": lambda v: str(v).lower(),
+    "upper": lambda v: str(v).upper(),
+    "replace": lambda v, **kw: str(v).replace(kw["from"], kw["to"]),
+    "join": lambda v, sep="": sep.join(str(x) for x in v),
+    "length": len,
+    "abs": abs,
+}
+
+
+class _TemplateMap(dict):
+    # Tera reads map keys as attributes: {{ loop.last }}, {{ db.port }}
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+def _template_value(value):
+    if isinstance(value, dict):
+        return _TemplateMap({k: _template_value(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_template_value(v) for v in value]
+    return value
+
+
+def template_path(root, path="", sep="/"):
+    """Tera path(): join root and path with sep as the only separator."""
+    root = re.sub(r"[\\/]+", lambda _: sep, str(root))
+    parts = [p for p in re.split(r"[\\/]+", path) if p]
+    return sep.join([root.rstrip(sep) if parts else root] + parts)
+
+
+def _split_filters(expr):
+    parts, depth, quote, start = [], 0, None, 0
+    for i, ch in enumerate(expr):
+        if quote:
+            quote = None if ch == quote else quote
+        elif ch in "\"'":
+            quote = ch
+        elif ch in "([":
+            depth += 1
+        elif ch in ")]":
+            depth -= 1
+        elif ch == "|" and depth == 0:
+            parts.append(expr[start:i])
+            start = i + 1
+    parts.append(expr[start:])
+    return [p.strip() for p in parts]
+
+
+def _template_defined(context, name):
+    value = context
+    for key in name.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return False
+        value = value[key]
+    return True
+
+
+def _template_eval(expr, context):
+    namespace = {"__builtins__": {}, "true": True, "false": False, "path": template_path, **context}
+    # `x is defined` is a Tera test, not Python
+    expr = re.sub(r"([\w.]+)\s+is\s+(not\s+)?defined",
+                  lambda m: f"{m.group(2) or ''}__defined({m.group(1)!r})", expr)
+    namespace["__defined"] = lambda name: _template_defined(context, name)
+    value, *filters = _split_filters(expr)
+    try:
+        try:
+            value = eval(value, namespace)
+        except NameError:
+            # Like Tera, `default` also covers a variable that isn't defined
+            if not (filters and filters[0].startswith("default")):
+                raise
+            value = None
+        for f in filters:
+            name, _, args = f.partition("(")
+            kwargs = eval(f"__kw({args}", dict(namespace, __kw=lambda **kw: kw)) if args else {}
+            value = _TEMPLATE_FILTERS[name.strip()](value, **kwargs)
+    except NameError as e:
+        raise ValueError(f"Template variable is not defined: {e}") from None
+    return value
+
+
+def _render_tokens(tokens, i, context, stops=(), active=True):
+    """Render tokens[i:] until a tag in stops. Returns (text, index, tag)."""
+    out = []
+    while i < len(tokens):
+        token = tokens[i]
+        inner = token[2:-2].strip("-").strip()
+        if token.startswith("{{"):
+            if active:
+                out.append(str(_template_eval(inner, context)))
+        elif token.startswith("{%"):
+            keyword = inner.split(None, 1)[0]
+            if keyword in stops:
+                return "".join(out), i, inner
+            if keyword == "if":
+                taken = False
+                condition = active and _template_eval(inner[2:], context)
+                while True:
+                    body, i, tag = _render_tokens(tokens, i + 1, context, ("elif", "else", "endif"), condition)
+                    if condition:
+                        out.append(body)
+                        taken = True
+                    keyword = tag.split(None, 1)[0]
+                    if keyword == "endif":
+                        break
+                    pending = active and not taken
+                    condition = pending and (keyword == "else" or _template_eval(tag[4:], context))
+            elif keyword == "for":
+                names, expr = re.match(r"for\s+(.+?)\s+in\s+(.+)", inner, re.S).groups()
+                names = [n.strip() for n in names.split(",")]
+                items = _template_eval(expr, context) if active else []
+                items = list(items.items() if isinstance(items, dict) else items)
+                start = i
+                _, i, _ = _render_tokens(tokens, start + 1, context, ("endfor",), False)
+                for n, item in enumerate(items):
+                    scope = dict(context, loop=_TemplateMap({"index": n + 1, "index0": n, "first": n == 0, "last": n == len(items) - 1}))
+                    scope.update(zip(names, item) if len(names) > 1 else {names[0]: item})
+                    out.append(_render_tokens(tokens, start + 1, scope, ("endfor",))[0])
+            elif keyword == "set":
+                name, expr = inner[3:].split("=", 1)
+                if active:
+                    context[name.strip()] = _template_eval(expr, context)
+            else:
+                raise ValueError(f"Unsupported template tag: {inner}")
+        elif not token.startswith("{#") and active:
+            out.append(token)
+        i += 1
+    if stops:
+        raise ValueError(f"Template ended without {{% {stops[-1]} %}}")
+    return "".join(out), i, None
+
+
+def render_template(text, context):
+    # {% raw %} blocks are set aside so tags inside them are left alone
+    raw = _TEMPLATE_RAW.findall(text)
+    blocks = iter(range(len(raw)))
+    text = _TEMPLATE_RAW.sub(lambda _: f"\0{next(blocks)}\0", text)
+    tokens = _TEMPLATE_TAGS.split(text)
+    # {%- and -%} trim the whitespace next to the tag, like Tera
+    for i in range(1, len(tokens), 2):
+        if tokens[i][2] == "-":
+            tokens[i - 1] = tokens[i - 1].rstrip()
+        if tokens[i][-3] == "-" and i + 1 < len(tokens):
+            tokens[i + 1] = tokens[i + 1].lstrip()
+    rendered = _render_tokens(tokens, 0, {k: _template_value(v) for k, v in context.items()})[0]
+    return re.sub(r"\0(\d+)\0", lambda m: raw[int(m.group(1))], rendered)
+
+
+def scaffold_dir(component):
+    """Where a component keeps config.tmpl and options.toml."""
+    scaffold = ROOT / component / "scaffold"
+    return scaffold / ".ninja" if (scaffold / ".ninja").is_dir() else scaffold
+
+
+def shuriken_options(component, **overrides):
+    path = scaffold_dir(component) / "options.toml"
+    options = {}
+    if path.exists():
+        with open(path, "rb") as f:
+            options = tomllib.load(f)
+    options.update(overrides)
+    return options
+
+
+def host_disk_type(path="."):
+    """"hdd" when path lives on a rotational disk, otherwise "ssd"."""
+    try:
+        dev = os.stat(path).st_dev
+        block = Path(f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}").resolve()
+        if not (block / "queue").exists():
+            block = block.parent  # a partition; the queue belongs to the disk
+        return "hdd" if (block / "queue" / "rotational").read_text().strip() == "1" else "ssd"
+    except (AttributeError, OSError):
+        return "ssd"
+
+
+# Host resources the scaffolds leave at 0 (or "auto") in options.toml.
+# host.ns fills them in on the machine the shuriken is installed on; here this
+# machine is used.
+HOST_OPTIONS = {
+    "cpus": lambda: os.cpu_count() or 1,
+    "memory_mb": lambda: host_memory_mb() or 0,
+    "disk": host_disk_type,
+}
+
+
+def render_config(component, root, ninja_root=None, template="config.tmpl", **overrides):
+    """Render one of a component's templates the way the ninja manager does
+    for a shuriken installed at root."""
+    system = platform.system().lower()
+    options = shuriken_options(component, **overrides)
+    for name, detect in HOST_OPTIONS.items():
+        if options.get(name) in (0, "auto"):
+            options[name] = detect()
+    context = {
+        "root": str(root),
+        "ninja_root": str(ninja_root or Path(root).parent),
+        "platform": {"darwin": "macos"}.get(system, system),
+        **options,
+    }
+    return render_template((scaffold_dir(component) / template).read_text(encoding="utf-8"), context)
+
+
+# ----------------------------
+# Daemons
+# ----------------------------
+# Each daemon is a dict of:
+#   prepare(instance) -> state   render configs, initialize data (untimed)
+#   command(state)    -> argv    started and timed
+#   query(state)      -> bool    one readiness request
+#   stop              signal for a clean shutdown
+def caddy_prepare(instance, php_port=None, php_socket=None):
+    """php_socket talks FastCGI over that unix socket instead of php_port."""
+    artifact = artifact_dir("caddy")
+    port, admin = free_port(), free_port()
+    (instance / "logs").mkdir(parents=True)
+    (instance / "projects").mkdir()
+    shutil.copytree(ROOT / "caddy" / "scaffold" / "templates", instance / "templates")
+    php = {"php_transport": "unix", "php_socket": php_socket} if php_socket else \
+        {"php_transport": "tcp", "php_port": php_port or free_port()}
+    (instance / "Caddyfile").write_text(
+        render_config("caddy", instance, ninja_root=instance, port=port, **php), encoding="utf-8")
+    return {
+        "binary": artifact / f"caddy{EXE}",
+        "instance": instance,
+        "port": port,
+        # Keep the admin API and certificate storage away from a real install
+        "env": {"CADDY_ADMIN": f"127.0.0.1:{admin}", "XDG_DATA_HOME": str(instance / "data"),
+                "XDG_CONFIG_HOME": str(instance / "config")},
+    }
+
+
+def caddy_command(state):
+    return [str(state["binary"]), "run", "--config", str(state["instance"] / "Caddyfile"), "--adapter", "caddyfile"]
+
+
+def caddy_query(state):
+    conn = http.client.HTTPConnection("127.0.0.1", state["port"], timeout=1)
+    try:
+        conn.request("GET", "/")
+        conn.getresponse().read()
+        return True
+    except (OSError, http.client.HTTPException):
+        return False
+    finally:
+        conn.close()
+
+
+def _override_ini(text, overrides):
+    """Replace `key = value` lines (appending missing keys at the end)."""
+    lines, seen = [], set()
+    for line in text.splitlines():
+        key = line.split("=", 1)[0].strip()
+        if "=" in line and not line.lstrip().startswith(";") and key in overrides:
+            seen.add(key)
+            if overrides[key] is not None:
+                lines.append(f"{key} = {overrides[key]}")
+            continue
+        lines.append(line)
+    lines += [f"{k} = {v}" for k, v in overrides.items() if k not in seen and v is not None]
+    return "\n".join(lines) + "\n"
+
+
+def fpm_prepare(instance, port=None, pool=None, socket_path=None):
+    """pool overrides www.conf.tmpl options, e.g. {"pm": "static"}. With
+    socket_path FastCGI is served on that unix socket instead of port."""
+    artifact = artifact_dir("php")
+    port = port or free_port()
+    if socket_path:
+        listen = {"transport": "unix", "socket": str(socket_path)}
+    else:
+        listen = {"transport": "tcp", "port": port}
+    etc = ROOT / "php" / "scaffold" / "etc"
+    (instance / "etc" / "php-fpm.d").mkdir(parents=True)
+    (instance / "sessions").mkdir()
+    (instance / "opcache").mkdir()
+    (instance / "etc" / "php.ini").write_text(render_config("php", instance), encoding="utf-8")
+    shutil.copy(ROOT / "php" / "scaffold" / "preload.php", instance / "preload.php")
+    (instance / "etc" / "php-fpm.conf").write_text(_override_ini((etc / "php-fpm.conf").read_text(), {
+        "pid": instance / "php-fpm.pid",
+        "error_log": instance / "php-fpm.log",
+        "daemonize": "no",
+        "include": instance / "etc" / "php-fpm.d" / "*.conf",
+    }))
+    (instance / "etc" / "php-fpm.d" / "www.conf").write_text(
+        render_config("php", instance, template="www.conf.tmpl", **{**(pool or {}), **listen}), encoding="utf-8")
+    return {"binary": artifact / "sbin" / "php-fpm", "instance": instance, "port": port, "socket": socket_path, "env": {}}
+
+
+def fpm_command(state):
+    instance = state["instance"]
+    cmd = [str(state["binary"]), "--nodaemonize", "--fpm-config", str(instance / "etc" / "php-fpm.conf"),
+           "-c", str(instance / "etc" / "php.ini"), "--prefix", str(instance)]
+    if hasattr(os, "geteuid") and os.geteuid() == 0:
+        cmd.append("--allow-to-run-as-root")
+    return cmd
+
+
+def fpm_query(state):
+    # FCGI_GET_VALUES is answered by the master without running any PHP
+    name = b"FCGI_MPXS_CONNS"
+    body = bytes([len(name), 0]) + name
+    record = struct.pack("!BBHHBx", 1, 9, 0, len(body), 0) + body
+    try:
+        with connect(state, 1) as s:
+            s.sendall(record)
+            header = s.recv(8)
+            return len(header) == 8 and header[1] == 10  # FCGI_GET_VALUES_RESULT
+    except OSError:
+        return False
+
+
+def mariadb_prepare(instance):
+    artifact = artifact_dir("mariadb")
+    port = free_port()
+    user = ["--user=" + getpass.getuser()] if os.name != "nt" else []
+    (instance / "my.ini").write_text(
+        render_config("mariadb", artifact, port=port, bind_address="127.0.0.1"), encoding="utf-8")
+    install_db = artifact / "scripts" / "mariadb-install-db"
+    if os.name == "nt":
+        run(f'"{artifact / "bin" / "mariadb-install-db.exe"}" --datadir="{instance / "data"}"')
+    else:
+        run(f'"{install_db}" --no-defaults --basedir="{artifact}" --datadir="{instance / "data"}" '
+            f'--auth-root-authentication-method=normal {" ".join(user)} > "{instance / "install-db.log"}"')
+    return {
+        "binary": artifact / "bin" / f"mariadbd{EXE}",
+        "client": artifact / "bin" / f"mariadb{EXE}",
+        "instance": instance,
+        "port": port,
+        "args": [f"--datadir={instance / 'data'}", f"--pid-file={instance / 'mariadb.pid'}",
+                 f"--log-error={instance / 'error.log'}"] + user,
+        "env": {},
+    }
+
+
+def mariadb_command(state):
+    return [str(state["binary"]), f"--defaults-file={state['instance'] / 'my.ini'}", *state["args"]]
+
+
+def mariadb_query(state):
+    return quiet([str(state["client"]), "--no-defaults", "-h", "127.0.0.1", "-P", str(state["port"]),
+                  "-u", "root", "-e", "SELECT 1"])
+
+
+def postgres_prepare(instance):
+    artifact = artifact_dir("postgres")
+    port = free_port()
+    data = instance / "data"
+    run(f'"{artifact / "bin" / f"initdb{EXE}"}" -D "{data}" -U postgres -A trust > "{instance / "initdb.log"}"')
+    (instance / "postgresql.conf").write_text(
+        render_config("postgres", instance, port=port, listen_addresses="127.0.0.1"), encoding="utf-8")
+    # Same layout as postinstall.ns
+    with open(data / "postgresql.conf", "a", encoding="utf-8") as f:
+        f.write("\ninclude_if_exists = '../postgresql.conf'\n")
+    return {"binary": artifact / "bin" / f"postgres{EXE}", "client": artifact / "bin" / f"psql{EXE}",
+            "instance": instance, "port": port, "env": {}}
+
+
+def postgres_command(state):
+    cmd = [str(state["binary"]), "-D", str(state["instance"] / "data")]
+    if os.name != "nt":
+        cmd += ["-k", str(state["instance"])]  # the default socket dir may not be writable
+    return cmd
+
+
+def postgres_query(state):
+    return quiet([str(state["client"]), "-h", "127.0.0.1", "-p", str(state["port"]), "-U", "postgres",
+                  "-d", "postgres", "-tAc", "SELECT 1"])
+
+
+DAEMONS = {
+    "caddy": {"prepare": caddy_prepare, "command": caddy_command, "query": caddy_query},
+    "php": {"prepare": fpm_prepare, "command": fpm_command, "query": fpm_query},
+    "mariadb": {"prepare": mariadb_prepare, "command": mariadb_command, "query": mariadb_query},
+    # SIGINT is postgres' fast shutdown; SIGTERM waits for clients to leave
+    "postgres": {"prepare": postgres_prepare, "command": postgres_command, "query": postgres_query,
+                 "stop": getattr(signal, "SIGINT", signal.SIGTERM)},
+}
+
+
+# ----------------------------
+# Measurement
+# ----------------------------
+def drop_caches():
+    run("sync")
+    with open("/proc/sys/vm/drop_caches", "w") as f:
+        f.write("3\n")
+
+
+def launch(daemon, state):
+    """Start a daemon and wait until it is ready.
+    Returns (process, accept, ready), times in seconds since exec."""
+    log = open(state["instance"] / "stdout.log", "ab")
+    env = dict(os.environ, **state["env"])
+    start = time.perf_counter()
+    process = subprocess.Popen(daemon["command"](state), cwd=state["instance"], env=env,
+                               stdout=log, stderr=subprocess.STDOUT)
+    process.log = log
+    accept = ready = None
+    try:
+        while ready is None:
+            now = time.perf_counter()
+            if process.poll() is not None:
+                raise RuntimeError(f"exited with code {process.returncode}, see {state['instance']}")
+            if now - start > TIMEOUT:
+                raise RuntimeError(f"not ready after {TIMEOUT:.0f}s, see {state['instance']}")
+            if accept is None:
+                if accepts(state):
+                    accept = time.perf_counter() - start
+                else:
+                    time.sleep(0.002)
+                    continue
+            if daemon["query"](state):
+                ready = time.perf_counter() - start
+            else:
+                time.sleep(0.005)
+    except BaseException:
+        shutdown(daemon, process)
+        raise
+    return process, accept, ready
+
+
+def shutdown(daemon, process):
+    if process.poll() is None:
+        if os.name == "nt":
+            process.terminate()
+        else:
+            process.send_signal(daemon.get("stop", signal.SIGTERM))
+        try:
+            process.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    process.log.close()
+
+
+def start_once(daemon, state):
+    """Start, wait until ready, stop. Returns (accept, ready) in seconds."""
+    process, accept, ready = launch(daemon, state)
+    shutdown(daemon, process)
+    return accept, ready
+
+
+def bench_component(component, runs, workdir, drop):
+    daemon = DAEMONS[component]
+    results = {"cold": [], "warm": []}
+
+    for n in range(runs):
+        instance = workdir / f"{component}-cold-{n}"
+        instance.mkdir()
+        state = daemon["prepare"](instance)
+        if drop:
+            drop_caches()
+        results["cold"].append(start_once(daemon, state))
+
+    instance = workdir / f"{component}-warm"
+    instance.mkdir()
+    state = daemon["prepare"](instance)
+    start_once(daemon, state)  # primes the page cache and the data directory
+    for _ in range(runs):
+        results["warm"].append(start_once(daemon, state))
+    return results
+
+
+def stats(values):
+    values = sorted(values)
+    return {
+        "min": values[0],
+        "median": statistics.median(values),
+        "p90": values[min(len(values) - 1, int(round(0.9 * (len(values) - 1))))],
+        "max": values[-1],
+    }
+
+
+def report(component, results):
+    summary = {}
+    for mode in ("cold", "warm"):
+        accept = stats([a for a, _ in results[mode]])
+        ready = stats([r for _, r in results[mode]])
+        summary[mode] = {"accept": accept, "ready": ready, "runs": results[mode]}
+        good(f"  {component:<9} {mode:<5} accept {accept['median'] * 1000:8.1f}ms (min {accept['min'] * 1000:.1f}, "
+             f"max {accept['max'] * 1000:.1f})   ready {ready['median'] * 1000:8.1f}ms "
+             f"(min {ready['min'] * 1000:.1f}, p90 {ready['p90'] * 1000:.1f}, max {ready['max'] * 1000:.1f})")
+    return summary
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="startup", description="Time-to-ready benchmark for built daemons")
+    parser.add_argument("components", nargs="*", default=list(DAEMONS))
+    parser.add_argument("--runs", type=int, default=5, help="cold and warm starts per component")
+    parser.add_argument("--json", help="write all timings to this file")
+    parser.add_argument("--drop-caches", action="store_true", help="drop the page cache before cold runs (Linux, root)")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch instances")
+    args = parser.parse_args(argv)
+
+    unknown = [c for c in args.components if c not in DAEMONS]
+    if unknown:
+        raise RuntimeError(f"No startup benchmark for: {', '.join(unknown)}")
+    if args.drop_caches and not (platform.system() == "Linux" and os.geteuid() == 0):
+        raise RuntimeError("--drop-caches needs root on Linux")
+
+    workdir = Path(tempfile.mkdtemp(prefix="ninja-startup-"))
+    summary, failed = {}, []
+    try:
+        for component in args.components:
+            if component == "postgres" and hasattr(os, "geteuid") and os.geteuid() == 0:
+                warn("[SKIP] postgres refuses to run as root")
+                continue
+            info(f"[STARTUP] {component}: {args.runs} cold + {args.runs} warm starts")
+            try:
+                results = bench_component(component, args.runs, workdir, args.drop_caches)
+            except (OSError, RuntimeError, subprocess.CalledProcessError) as e:
+                err(f"[STARTUP FAILED] {component}: {e}")
+                failed.append(component)
+                continue
+            summary[component] = report(component, results)
+    finally:
+        if args.keep or failed:
+            info(f"Instances kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"host": platform.node(), "time": time.time(), "results": summary}, f, indent=2)
+        good(f"Timings written to {args.json}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main(sys.argv[1:]))
+    except Exception as e:
+        err(str(e))
+        sys.exit(1)
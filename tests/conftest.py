@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The components are imported as top-level packages, like `uv run -m` does
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,56 @@
+# Reruns of precompress against the index, with gzip only so no tools are needed.
+
+import gzip
+import os
+
+import pytest
+
+import precompress
+
+TEXT = "body { color: red; }\n" * 500
+
+
+@pytest.fixture
+def calls(tmp_path, monkeypatch):
+    monkeypatch.setattr(precompress, "CACHE_DIR", tmp_path / "cache")
+    compressed = []
+    gzip_file = precompress._gzip
+
+    def counting(src, dest):
+        compressed.append(src.name)
+        gzip_file(src, dest)
+
+    monkeypatch.setattr(precompress, "_gzip", counting)
+    return compressed
+
+
+def run(site):
+    assert precompress.main([str(site), "--encodings", "gzip"]) == 0
+
+
+def test_dropped_sidecar_is_not_retried(tmp_path, calls):
+    site = tmp_path / "site"
+    site.mkdir()
+    (site / "app.css").write_text(TEXT)
+    (site / "random.txt").write_bytes(os.urandom(4096))
+    run(site)
+    assert sorted(calls) == ["app.css", "random.txt"]
+    assert not (site / "random.txt.gz").exists()
+
+    run(site)
+    assert sorted(calls) == ["app.css", "random.txt"]
+    assert (site / "app.css.gz").exists()
+
+
+def test_asset_replaced_by_an_older_copy_is_recompressed(tmp_path, calls):
+    site = tmp_path / "site"
+    site.mkdir()
+    asset = site / "app.css"
+    asset.write_text(TEXT)
+    run(site)
+
+    asset.write_text(TEXT.replace("red", "blue"))
+    os.utime(asset, ns=(1, 1))
+    run(site)
+    assert calls == ["app.css", "app.css"]
+    assert gzip.decompress((site / "app.css.gz").read_bytes()).decode() == asset.read_text()
@@ -0,0 +1,120 @@
+# resolver.py against local stand-ins for the upstream indexes: one HTTP
+# server per "host", each answering slowly, so concurrency and the pinned
+# plan can be checked without the network.
+
+import json
+import platform
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import resolver
+import util
+from mariadb.main import lock_key
+from php.main import PHP_VERSION
+from caddy.main import GO_VERSION
+
+DELAY = 0.5
+
+
+def serve(pages):
+    """Start a keep-alive HTTP/1.1 server for {path: body}. Returns (server, base url, connections)."""
+    connections = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            connections.append(self.client_address)
+
+        def do_GET(self):
+            time.sleep(DELAY)
+            body = pages.get(self.path)
+            if body is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = body.encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}", connections
+
+
+@pytest.fixture
+def upstream(monkeypatch, tmp_path):
+    monkeypatch.setattr(util, "CACHE_DIR", tmp_path)
+    system, arch = util.get_system_arch()
+    go_file = f"go{GO_VERSION}.{system}-{arch}.{'zip' if system == 'windows' else 'tar.gz'}"
+    hosts = {
+        "httpd": {"/httpd/": '<a href="httpd-2.4.58.tar.gz"></a><a href="httpd-2.4.62.tar.gz"></a>'},
+        "apr": {"/apr/": '<a href="apr-1.7.5.tar.gz"></a><a href="apr-util-1.6.3.tar.gz"></a>'},
+        "postgres": {"/pg/": '<a href="v17.2/"></a><a href="v18.1/"></a>'},
+        "php": {"/php": json.dumps({"source": [{"filename": f"php-{PHP_VERSION}.tar.gz", "sha256": "aa" * 32}]})},
+        "go": {"/go": json.dumps([{"files": [{"filename": go_file, "sha256": "bb" * 32}]}])},
+        "mariadb": {
+            "/mariadb/": json.dumps({"major_releases": [{"release_id": "11.4", "release_status": "Stable"}]}),
+            "/mariadb/11.4/": json.dumps({"releases": {"11.4.8": {"files": [{
+                "package_type": "ZIP file" if platform.system() == "Windows" else "gzipped tar file",
+                "os": platform.system(), "cpu": platform.machine(),
+                "file_download_url": "https://example.invalid/mariadb-11.4.8.tar.gz",
+                "checksum": {"sha256sum": "cc" * 32}}]}}}),
+        },
+    }
+    servers = {name: serve(pages) for name, pages in hosts.items()}
+    base = {name: url for name, (_, url, _) in servers.items()}
+    monkeypatch.setattr(resolver, "HTTPD_INDEX", base["httpd"] + "/httpd/")
+    monkeypatch.setattr(resolver, "APR_INDEX", base["apr"] + "/apr/")
+    monkeypatch.setattr(resolver, "PG_BASE_URL", base["postgres"] + "/pg/")
+    monkeypatch.setattr(resolver, "PHP_RELEASES", base["php"] + "/php")
+    monkeypatch.setattr(resolver, "GO_RELEASES", base["go"] + "/go")
+    monkeypatch.setattr(resolver, "MARIADB_API", base["mariadb"] + "/mariadb/")
+    yield {name: connections for name, (_, _, connections) in servers.items()}
+    for server, _, _ in servers.values():
+        server.shutdown()
+        server.server_close()
+
+
+def test_plan_uses_the_keys_the_builders_read(upstream):
+    plan, errors = resolver.asyncio.run(resolver.resolve_all(list(resolver.RESOLVERS)))
+    assert errors == {}
+    system, arch = util.get_system_arch()
+    assert plan["httpd"][0] == "2.4.62"
+    assert [v[0] for v in plan["apr"]] == ["1.7.5", "1.6.3"]
+    assert plan["postgres"][0] == "18.1"
+    assert plan["php"] == [PHP_VERSION, f"php-{PHP_VERSION}.tar.gz",
+                           f"https://www.php.net/distributions/php-{PHP_VERSION}.tar.gz", "aa" * 32]
+    assert plan[f"go-{system}-{arch}"][3] == "bb" * 32
+    if platform.system() in ("Windows", "Linux"):
+        assert plan[lock_key()][2] == "cc" * 32
+
+
+def test_hosts_are_resolved_concurrently(upstream):
+    start = time.time()
+    plan, errors = resolver.asyncio.run(resolver.resolve_all(list(resolver.RESOLVERS)))
+    elapsed = time.time() - start
+    assert errors == {}
+    # Six hosts, up to two sequential requests each: serial would take 3.5s
+    assert elapsed < 4 * DELAY
+    # Both MariaDB requests went over one keep-alive connection
+    if platform.system() in ("Windows", "Linux"):
+        assert len(upstream["mariadb"]) == 1
+
+
+def test_unreachable_host_is_reported_per_resolver(upstream, monkeypatch):
+    monkeypatch.setattr(resolver, "PHP_RELEASES", "http://127.0.0.1:9/php")
+    plan, errors = resolver.asyncio.run(resolver.resolve_all(["php", "postgres"]))
+    assert set(errors) == {"php"}
+    assert plan["postgres"][0] == "18.1"
@@ -0,0 +1,111 @@
+# Packing, deltas and applying them to an installed tree, on small stand-in
+# artifacts. Needs the zstd binary.
+
+import shutil
+
+from pathlib import Path
+
+import pytest
+
+import shuriken
+
+pytestmark = pytest.mark.skipif(shutil.which("zstd") is None, reason="zstd not installed")
+
+OPTIONS = """memory = 256
+opcache_memory = 128
+cpus = 0
+memory_mb = 0
+
+[env]
+APP_ENV = "prod"
+"""
+
+
+def write_tree(root, files):
+    for rel, text in files.items():
+        path = Path(root) / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+
+
+def build(tmp_path, name, files):
+    artifact = tmp_path / f"{name}-artifact"
+    write_tree(artifact, {
+        ".ninja/manifest.toml": '[config]\nconfig-path="etc/php.ini"\n',
+        ".ninja/options.toml": OPTIONS,
+        "etc/php.ini": "; shipped\n",
+        **files,
+    })
+    archive = tmp_path / f"{name}.shuriken"
+    shuriken.pack(artifact, archive)
+    return archive
+
+
+def test_delta_applies_over_installer_and_user_changes(tmp_path):
+    old = build(tmp_path, "old", {"bin/php": "old binary\n" * 100})
+    new = build(tmp_path, "new", {
+        "bin/php": "new binary\n" * 100,
+        ".ninja/options.toml": OPTIONS.replace("opcache_memory = 128", "opcache_memory = 256")
+                               .replace("cpus = 0", "jit = \"tracing\"\ncpus = 0"),
+    })
+    delta = shuriken.make_delta(old, new, max_ratio=None)
+
+    root = tmp_path / "installed"
+    shuriken.unpack(old, root)
+    # what host.ns, the ninja manager and the user do after install
+    write_tree(root, {
+        ".ninja/options.toml": OPTIONS.replace("cpus = 0", "cpus = 8").replace("memory = 256", "memory = 512")
+                               + 'DEBUG = "1"\n',
+        "etc/php.ini": "; rendered\n",
+        "data/base/1": "rows\n",
+    })
+    data = (root / "data" / "base" / "1").stat().st_ino
+
+    shuriken.apply_delta(delta, root)
+
+    assert (root / "bin" / "php").read_text() == "new binary\n" * 100
+    options = (root / ".ninja" / "options.toml").read_text()
+    assert "cpus = 8" in options and "memory = 512" in options  # installer and user values
+    assert "opcache_memory = 256" in options and 'jit = "tracing"' in options  # new defaults
+    assert options.index('DEBUG = "1"') > options.index("[env]")
+    assert (root / "etc" / "php.ini").read_text() == "; rendered\n"
+    assert (root / "etc" / "php.ini.new").read_text() == "; shipped\n"
+    assert (root / "data" / "base" / "1").stat().st_ino == data  # moved, not copied
+
+
+def test_delta_refuses_a_different_build(tmp_path):
+    old = build(tmp_path, "old", {"bin/php": "old\n"})
+    new = build(tmp_path, "new", {"bin/php": "new\n"})
+    other = build(tmp_path, "other", {"bin/php": "other\n"})
+    delta = shuriken.make_delta(old, new, max_ratio=None)
+
+    root = tmp_path / "installed"
+    shuriken.unpack(other, root)
+    with pytest.raises(RuntimeError, match="does not apply"):
+        shuriken.apply_delta(delta, root)
+    assert (root / "bin" / "php").read_text() == "other\n"
+
+
+def test_failed_package_keeps_the_previous_archive(tmp_path, monkeypatch):
+    monkeypatch.setattr(shuriken, "DIST_DIR", tmp_path / "dist")
+    artifact = tmp_path / "artifact"
+    binary = "".join(f"{i * 7919 % 100003}\n" for i in range(20000))
+    write_tree(artifact, {"bin/php": binary})
+    archive = shuriken.package("demo", artifact)
+    packed = archive.read_bytes()
+
+    def broken(root, dest):
+        Path(dest).write_bytes(b"partial")
+        raise RuntimeError("zstd failed")
+
+    monkeypatch.setattr(shuriken, "pack", broken)
+    with pytest.raises(RuntimeError):
+        shuriken.package("demo", artifact)
+    assert archive.read_bytes() == packed
+    assert not archive.with_name(archive.name + ".prev").exists()
+
+    monkeypatch.undo()
+    monkeypatch.setattr(shuriken, "DIST_DIR", tmp_path / "dist")
+    write_tree(artifact, {"bin/php": binary + "new\n"})
+    shuriken.package("demo", artifact)
+    assert list(archive.parent.glob("*.shuriken-delta"))
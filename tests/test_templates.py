@@ -0,0 +1,45 @@
+# startup.py renders the scaffolds' Tera templates with its own small
+# renderer. Every shipped .tmpl has to render with it on every platform, and
+# the shipped pool config must stay what www.conf.tmpl renders to, since the
+# ninja manager only renders config.tmpl on install.
+
+from pathlib import Path
+
+import pytest
+
+import startup
+
+ROOT = Path(__file__).resolve().parent.parent
+TEMPLATES = sorted(ROOT.glob("*/scaffold/**/*.tmpl"))
+
+
+@pytest.mark.parametrize("platform", ["linux", "macos", "windows"])
+@pytest.mark.parametrize("template", TEMPLATES, ids=lambda p: str(p.relative_to(ROOT)))
+def test_every_template_renders(template, platform):
+    component = template.relative_to(ROOT).parts[0]
+    rendered = startup.render_config(component, ROOT / component / "artifact", template=template.name,
+                                     platform=platform)
+    assert rendered.strip()
+
+
+def test_filters_and_loops_match_tera():
+    context = {"n": 7, "items": ["a", "b", "c"], "env": {"A": 1}}
+    text = ('{% set half = n / 2 %}{{ half | round(method="ceil") | int }} {{ half | int }} '
+            '{% for i in items %}{{ i }}{% if not loop.last %},{% endif %}{% endfor %} '
+            '{% for k, v in env %}{{ k }}={{ v }}{% endfor %} {{ missing | default(value="x") }}')
+    assert startup.render_template(text, context) == "4 3 a,b,c A=1 x"
+
+
+def test_shipped_pool_matches_the_template():
+    rendered = startup.render_config("php", ROOT / "php" / "artifact", template="www.conf.tmpl",
+                                     cpus=2, memory_mb=2048, socket="var/run/php-fpm.sock")
+    assert (ROOT / "php" / "scaffold" / ".ninja" / "www.conf").read_text(encoding="utf-8") == rendered
+
+
+def test_pool_settings_outside_options_toml_can_be_overridden():
+    rendered = startup.render_config("php", ROOT / "php" / "artifact", template="www.conf.tmpl",
+                                     pm="static", max_children=6, env={"APP_ENV": "bench"})
+    assert "\npm = static\n" in rendered
+    assert "\npm.max_children = 6\n" in rendered
+    assert "\n;pm.min_spare_servers = 1\n" in rendered
+    assert "\nenv[APP_ENV] = bench\n" in rendered
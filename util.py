@@ -1,13 +1,24 @@
+import atexit
 import hashlib
+import json
 import os
 import platform
+import re
 import shutil
 import sys
 import subprocess
 import tarfile
+import tempfile
+import threading
+import time
+import urllib.error
 import urllib.request
 import zipfile
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+
 from pathlib import Path
 from tqdm import tqdm
 
@@ -26,47 +37,841 @@ def warn(x): print(c(x, "33"))
 def err(x):  print(c(x, "31"))
 
 
+# ----------------------------
+# Jobserver
+# ----------------------------
+# One pool of CPU slots shared by every command run() starts. The pool is a
+# GNU make jobserver: a FIFO holding one byte per slot. The orchestrator
+# creates it and passes its path in NINJA_JOBSERVER; a builder started on its
+# own creates a private one. run() holds a slot while its command runs (that
+# is the implicit slot make/ninja get for free) and hands the FIFO to the
+# child through MAKEFLAGS, so parallel makes draw their extra jobs from the
+# same pool instead of each assuming the whole machine.
+JOBS = int(os.environ.get("NINJA_JOBS", 0)) or os.cpu_count() or 1
+JOB_MEMORY_MB = int(os.environ.get("NINJA_JOB_MEMORY_MB", 0))
+
+_jobserver_lock = threading.Lock()
+_jobserver_fd = None
+
+
+def host_memory_mb():
+    """Physical memory in MiB, or None when it can't be determined."""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        pass
+    if os.name == "nt":
+        import ctypes
+
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                        ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                        ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                        ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                        ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullTotalPhys // (1024 * 1024)
+    return None
+
+
+def job_count():
+    """Size of the CPU pool: NINJA_JOBS (default: all cores), capped so that
+    NINJA_JOB_MEMORY_MB per job fits in physical memory."""
+    jobs = JOBS
+    memory = host_memory_mb()
+    if JOB_MEMORY_MB and memory:
+        jobs = min(jobs, memory // JOB_MEMORY_MB)
+    return max(1, jobs)
+
+
+def create_jobserver(directory, jobs):
+    """Create a jobserver FIFO with `jobs` slots. The returned fd must stay
+    open for as long as the pool is in use."""
+    path = os.path.join(directory, "jobserver")
+    os.mkfifo(path)
+    fd = os.open(path, os.O_RDWR)
+    os.write(fd, b"+" * jobs)
+    return path, fd
+
+
+def _jobserver():
+    global _jobserver_fd
+    if os.name == "nt":
+        return None
+    with _jobserver_lock:
+        if _jobserver_fd is None:
+            path = os.environ.get("NINJA_JOBSERVER")
+            if path:
+                _jobserver_fd = os.open(path, os.O_RDWR)
+            else:
+                directory = tempfile.mkdtemp(prefix="ninja-jobserver-")
+                path, _jobserver_fd = create_jobserver(directory, job_count())
+                os.environ["NINJA_JOBSERVER"] = path
+                atexit.register(shutil.rmtree, directory, True)
+        return _jobserver_fd
+
+
+@lru_cache(maxsize=None)
+def _make_version():
+    try:
+        out = subprocess.run(["make", "--version"], capture_output=True, text=True).stdout
+    except OSError:
+        return (0, 0)
+    parts = out.split("\n", 1)[0].rsplit(" ", 1)[-1].split(".")
+    try:
+        return int(parts[0]), int(parts[1])
+    except (IndexError, ValueError):
+        return (0, 0)
+
+
+def jobs_flag():
+    """-j argument for make and `cmake --build . --`. Empty when a jobserver
+    hands out the slots, since an explicit -jN makes make ignore it."""
+    return "" if _jobserver() is not None else f"-j{job_count()}"
+
+
+@contextmanager
+def job_slot():
+    fd = _jobserver()
+    if fd is None:
+        yield
+        return
+    token = os.read(fd, 1)
+    try:
+        yield
+    finally:
+        os.write(fd, token)
+
+
+def _run_kwargs(env):
+    fd = _jobserver()
+    if fd is None:
+        return {"env": env}
+    env = dict(os.environ if env is None else env)
+    # make >= 4.4 and ninja >= 1.13 understand the FIFO form, make 4.2 and 4.3
+    # only the inherited-fd one. Before 4.2 the option was --jobserver-fds;
+    # those makes ignore --jobserver-auth and would take the bare -j as
+    # "unlimited" (macOS still ships 3.81).
+    version = _make_version()
+    if version >= (4, 4):
+        flag = f"--jobserver-auth=fifo:{os.environ['NINJA_JOBSERVER']}"
+    elif version >= (4, 2):
+        flag = f"--jobserver-auth={fd},{fd}"
+    else:
+        flag = f"--jobserver-fds={fd},{fd}"
+    env["MAKEFLAGS"] = f" -j {flag} {env.get('MAKEFLAGS', '')}".rstrip()
+    # NINJA_JOB_MEMORY_MB only sizes the pool. An address-space limit on a
+    # whole make tree breaks sanitizers, JITs and linkers, which reserve far
+    # more than they ever touch.
+    return {"env": env, "pass_fds": (fd,)}
+
+
+# ----------------------------
+# Compiler cache
+# ----------------------------
+# ccache (or sccache) in front of every C/C++ compile. With ccache each
+# component gets its own cache dir under NINJA_COMPILER_CACHE_DIR. sccache runs
+# one server per user that only reads SCCACHE_DIR when it starts, so all
+# components share NINJA_COMPILER_CACHE_DIR/sccache. The counters are never
+# zeroed (parallel builds would reset each other's); a component reports the
+# difference from the stats it saw when it started (with sccache that also
+# counts components compiling at the same time). NINJA_COMPILER_CACHE picks
+# the tool: auto (default), ccache, sccache or off.
+COMPILER_CACHE = os.environ.get("NINJA_COMPILER_CACHE", "auto").lower()
+COMPILER_CACHE_DIR = Path(os.environ.get(
+    "NINJA_COMPILER_CACHE_DIR", Path.home() / ".cache" / "ninja-packages" / "compiler"))
+
+_compiler_cache_start = {}
+
+
+def _compiler_launcher():
+    if COMPILER_CACHE in ("off", "0", "no", "false"):
+        return None
+    tools = ("ccache", "sccache") if COMPILER_CACHE == "auto" else (COMPILER_CACHE,)
+    for tool in tools:
+        if tool_exists(tool):
+            return shutil.which(tool)
+    if COMPILER_CACHE != "auto":
+        warn(f"[COMPILER CACHE] {COMPILER_CACHE} not found in PATH, building without it")
+    return None
+
+
+def _setup_compiler_cache(component):
+    launcher = _compiler_launcher()
+    if launcher is None:
+        return None
+    if Path(launcher).stem == "sccache":
+        cache_dir = COMPILER_CACHE_DIR / "sccache"
+        os.environ["SCCACHE_DIR"] = str(cache_dir)
+    else:
+        cache_dir = COMPILER_CACHE_DIR / component
+        os.environ["CCACHE_DIR"] = str(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    if component not in _compiler_cache_start:
+        _compiler_cache_start[component] = _compiler_cache_stats(launcher)
+    info(f"[COMPILER CACHE] {Path(launcher).stem} -> {cache_dir}")
+    return launcher
+
+
+def autoconf_compiler_cache(component):
+    """Route CC/CXX through the compiler cache for autoconf-style builds."""
+    launcher = _setup_compiler_cache(component)
+    if launcher is None:
+        return
+    for var, default in (("CC", "cc"), ("CXX", "c++")):
+        compiler = os.environ.get(var, default)
+        if compiler.split(" ", 1)[0] != launcher:
+            os.environ[var] = f"{launcher} {compiler}"
+
+
+def cmake_compiler_cache(component):
+    """CMake arguments that put the compiler cache in front of the compilers."""
+    launcher = _setup_compiler_cache(component)
+    if launcher is None:
+        return []
+    return [f"-DCMAKE_C_COMPILER_LAUNCHER={launcher}", f"-DCMAKE_CXX_COMPILER_LAUNCHER={launcher}"]
+
+
+def _compiler_cache_stats(launcher):
+    if Path(launcher).stem == "sccache":
+        out = subprocess.run([launcher, "--show-stats", "--stats-format=json"], capture_output=True, text=True).stdout
+        try:
+            stats = json.loads(out)["stats"]
+            return sum(stats["cache_hits"]["counts"].values()), sum(stats["cache_misses"]["counts"].values())
+        except (ValueError, KeyError):
+            return None
+    out = subprocess.run([launcher, "--print-stats"], capture_output=True, text=True).stdout
+    counters = dict(line.split("\t", 1) for line in out.splitlines() if "\t" in line)
+    try:
+        hits = int(counters["direct_cache_hit"]) + int(counters["preprocessed_cache_hit"])
+        return hits, int(counters["cache_miss"])
+    except (KeyError, ValueError):
+        return None
+
+
+def report_compiler_cache(component):
+    launcher = _compiler_launcher()
+    if launcher is None:
+        return
+    stats = _compiler_cache_stats(launcher)
+    start = _compiler_cache_start.get(component, (0, 0))
+    if stats is None or start is None:
+        warn(f"[COMPILER CACHE] {component}: could not read {Path(launcher).stem} stats")
+        return
+    hits, misses = stats[0] - start[0], stats[1] - start[1]
+    total = hits + misses
+    rate = f"{100 * hits / total:.1f}%" if total else "n/a"
+    good(f"[COMPILER CACHE] {component}: {hits} hits, {misses} misses ({rate} hit rate)")
+
+
+# ----------------------------
+# Shared configure cache
+# ----------------------------
+# autoconf answers many of its probes (headers, type sizes, compiler
+# features) the same way for every package on a host. run_configure() seeds
+# each configure's --cache-file from a shared cache and merges the new answers
+# back afterwards. Only compile-only results are shared. Function checks link
+# against the package's own LIBS (postgres adds -lm -lz -lreadline, ...), so a
+# "yes" from one package may not link in another. They stay local, along with
+# program/path lookups, library checks and the ac_cv_env_* precious variables.
+# The shared file is keyed by compiler, libc, the flag variables (-march and
+# -flto change probe results) and the mtimes of the system include/lib dirs,
+# so installing a compiler or -dev package starts a new one.
+CONFIGURE_CACHE = os.environ.get("NINJA_CONFIGURE_CACHE", "on").lower() not in ("off", "0", "no", "false")
+CONFIGURE_CACHE_DIR = Path(os.environ.get(
+    "NINJA_CONFIGURE_CACHE_DIR", Path.home() / ".cache" / "ninja-packages" / "autoconf"))
+
+_SHARED_CONFIGURE_PREFIXES = (
+    "ac_cv_header_", "ac_cv_sizeof_", "ac_cv_alignof_", "ac_cv_type_",
+    "ac_cv_member_", "ac_cv_c_", "ac_cv_build", "ac_cv_host",
+)
+_SYSTEM_DIRS = (
+    "/usr/include", "/usr/local/include", "/usr/lib", "/usr/lib64", "/usr/local/lib",
+    f"/usr/lib/{platform.machine()}-linux-gnu", "/opt/homebrew/include", "/opt/homebrew/lib",
+)
+_CONFIGURE_CACHE_LINE = re.compile(r"^(?:(\w+)=\$\{\1=|test \"\$\{(\w+)\+set\}\" = set \|\| )")
+
+
+def _configure_cache_path():
+    key = fingerprint(
+        platform.system(),
+        platform.machine(),
+        platform.libc_ver(),
+        _tool_version(os.environ.get("CC", "cc")),
+        {var: os.environ.get(var) for var in ("CFLAGS", "CPPFLAGS", "LDFLAGS", "LIBS")},
+        {d: os.stat(d).st_mtime_ns for d in _SYSTEM_DIRS if os.path.isdir(d)},
+    )
+    return CONFIGURE_CACHE_DIR / f"config-{key[:16]}.cache"
+
+
+def _read_configure_cache(path):
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            match = _CONFIGURE_CACHE_LINE.match(line)
+            if match:
+                entries[match.group(1) or match.group(2)] = line.rstrip("\n")
+    return entries
+
+
+def _write_configure_cache(path, entries):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("# Shared autoconf cache written by ninja-packages\n")
+        for name in sorted(entries):
+            f.write(entries[name] + "\n")
+    os.replace(tmp, path)
+
+
+def run_configure(cmd, cwd=None, env=None):
+    """run() an autoconf configure with a cache file seeded from the shared cache."""
+    if not CONFIGURE_CACHE:
+        run(cmd, cwd=cwd, env=env)
+        return
+
+    shared = _configure_cache_path()
+    local = os.path.join(cwd or ".", "config.cache")
+    with _file_lock(CONFIGURE_CACHE_DIR / ".lock"):
+        entries = _read_configure_cache(shared)
+    _write_configure_cache(local, entries)
+    info(f"[CONFIGURE CACHE] {len(entries)} shared results from {shared}")
+
+    run(f"{cmd} --cache-file={os.path.abspath(local)}", cwd=cwd, env=env)
+
+    found = {name: line for name, line in _read_configure_cache(local).items()
+             if name.startswith(_SHARED_CONFIGURE_PREFIXES)}
+    with _file_lock(CONFIGURE_CACHE_DIR / ".lock"):
+        entries = _read_configure_cache(shared)
+        added = len(found.keys() - entries.keys())
+        entries.update(found)
+        _write_configure_cache(shared, entries)
+    info(f"[CONFIGURE CACHE] {added} new results saved")
+
+
 # ----------------------------
 # Helpers
 # ----------------------------
+def _wait(process):
+    """Wait for process and return its resource usage (None on Windows).
+    wait4 also counts the descendants it waited for, i.e. the whole make tree."""
+    if not hasattr(os, "wait4"):
+        process.wait()
+        return None
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return usage
+
+
 def run(cmd, cwd=None, env=None):
     info(f"[RUN] {cmd} (cwd={cwd}) (env={env is not None})")
-    subprocess.check_call(cmd, shell=True, cwd=cwd, env=env)
+    with job_slot(), trace("run", cmd, cwd=str(cwd) if cwd else None) as event:
+        process = subprocess.Popen(cmd, shell=True, cwd=cwd, **_run_kwargs(env))
+        usage = _wait(process)
+        if usage is not None:
+            event.update(user=usage.ru_utime, sys=usage.ru_stime, max_rss=_rss_bytes(usage.ru_maxrss))
+        event["returncode"] = process.returncode
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, cmd)
 
-def _download(url, dest: Path):
-    dest = Path(dest)  # ensure it's a Path object
-    with urllib.request.urlopen(url) as response:
-        total_size = int(response.getheader('Content-Length', 0))
-        block_size = 8192
-        with open(dest, 'wb') as f, tqdm(
-            total=total_size, 
-            unit='B', 
-            unit_scale=True, 
-            unit_divisor=1024, 
-            desc=str(dest)  # <--- convert Path to string
-        ) as bar:
+# Set by the orchestrator. Every finished phase is appended to this file as a
+# JSON line so the parent can build its critical-path summary.
+PHASE_LOG = os.environ.get("NINJA_PHASE_LOG")
+
+@contextmanager
+def phase(component, name):
+    info(f"[PHASE] {component}: {name}")
+    start = time.time()
+    _trace_context.update(component=component, phase=name)
+    try:
+        with trace("phase", name):
+            yield
+    finally:
+        _trace_context["phase"] = None
+        if PHASE_LOG:
+            record = {"component": component, "phase": name, "start": start, "end": time.time()}
+            with open(PHASE_LOG, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+
+# ----------------------------
+# Tracing
+# ----------------------------
+# With NINJA_TRACE=<file>.json every run, download, extract and copy records
+# its wall time, child CPU time, peak RSS and bytes moved. Events from all
+# processes are appended to <file>.json.events.jsonl. The process that turned
+# tracing on (the orchestrator, or a builder run on its own) writes the Chrome
+# trace (chrome://tracing, ui.perfetto.dev) and a top-N summary per component
+# to <file>.txt when it exits.
+# Builders chdir, so the path is made absolute before anything else runs
+TRACE = os.path.abspath(os.environ["NINJA_TRACE"]) if os.environ.get("NINJA_TRACE") else None
+TRACE_TOP = int(os.environ.get("NINJA_TRACE_TOP", 10))
+
+_trace_context = {
+    "component": os.environ.get("NINJA_COMPONENT") or Path(sys.argv[0]).resolve().parent.name,
+    "phase": None,
+}
+
+
+def _rss_bytes(max_rss):
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+@contextmanager
+def trace(category, name, **args):
+    """Record the enclosed step. Yields a dict the caller can add results to."""
+    if not TRACE:
+        yield args
+        return
+    start = time.time()
+    try:
+        yield args
+    finally:
+        event = {
+            "cat": category,
+            "name": name,
+            "component": _trace_context["component"],
+            "phase": _trace_context["phase"],
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "start": start,
+            "end": time.time(),
+            "args": {k: v for k, v in args.items() if v is not None},
+        }
+        with open(f"{TRACE}.events.jsonl", "a", encoding="utf-8") as f:
+            f.write(json.dumps(event) + "\n")
+
+
+def _fmt_bytes(n):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n < 1024 or unit == "GiB":
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+
+
+def write_trace():
+    """Turn the collected events into a Chrome trace and a text summary."""
+    events_path = f"{TRACE}.events.jsonl"
+    if not os.path.exists(events_path):
+        return
+    with open(events_path, "r", encoding="utf-8") as f:
+        events = [json.loads(line) for line in f if line.strip()]
+    os.remove(events_path)
+    if not events:
+        return
+
+    t0 = min(e["start"] for e in events)
+    chrome = []
+    for pid, component in {e["pid"]: e["component"] for e in events}.items():
+        chrome.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": component}})
+    for e in events:
+        chrome.append({
+            "name": e["name"][:120],
+            "cat": e["cat"],
+            "ph": "X",
+            "ts": (e["start"] - t0) * 1e6,
+            "dur": (e["end"] - e["start"]) * 1e6,
+            "pid": e["pid"],
+            "tid": e["tid"],
+            "args": dict(e["args"], phase=e["phase"]),
+        })
+    with open(TRACE, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": chrome, "displayTimeUnit": "ms"}, f)
+
+    lines = []
+    for component in sorted({e["component"] for e in events}):
+        steps = [e for e in events if e["component"] == component and e["cat"] != "phase"]
+        steps.sort(key=lambda e: e["end"] - e["start"], reverse=True)
+        lines.append(f"{component}: top {min(TRACE_TOP, len(steps))} of {len(steps)} steps")
+        for e in steps[:TRACE_TOP]:
+            a = e["args"]
+            details = [f"{e['end'] - e['start']:8.1f}s", f"{e['cat']:<8}", f"{(e['phase'] or '-'):<10}"]
+            if "user" in a:
+                details.append(f"cpu {a['user']:.1f}u/{a['sys']:.1f}s rss {_fmt_bytes(a['max_rss'])}")
+            if "bytes" in a:
+                details.append(_fmt_bytes(a["bytes"]))
+            lines.append("  " + "  ".join(details) + f"  {e['name'][:80]}")
+    summary = os.path.splitext(TRACE)[0] + ".txt"
+    with open(summary, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+    info("\n[TRACE]")
+    for line in lines:
+        print(line)
+    good(f"[TRACE] {TRACE} (Chrome trace), {summary}")
+
+
+if TRACE and not os.environ.get("NINJA_TRACE_OWNER"):
+    os.environ["NINJA_TRACE"] = TRACE
+    os.environ["NINJA_TRACE_OWNER"] = str(os.getpid())
+    atexit.register(write_trace)
+
+# ----------------------------
+# Incremental builds
+# ----------------------------
+# A phase run through incremental() leaves <stamp_dir>/<component>-<phase>.stamp
+# holding a fingerprint of its inputs. The next build skips the phase when the
+# fingerprint is unchanged and its outputs still exist. Phases pass their
+# fingerprint on to the next one, so a new source tarball or configure flag
+# invalidates everything after it.
+def fingerprint(*inputs):
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _tool_version(cmd):
+    try:
+        result = subprocess.run(f"{cmd} --version", shell=True, capture_output=True, text=True)
+    except OSError:
+        return None
+    return result.stdout.split("\n", 1)[0] if result.returncode == 0 else None
+
+
+def toolchain_fingerprint():
+    """Compiler, make and flag environment that every compile depends on."""
+    return fingerprint(
+        _tool_version(os.environ.get("CC", "cc")),
+        _tool_version(os.environ.get("CXX", "c++")),
+        _tool_version("make"),
+        {var: os.environ.get(var) for var in ("CFLAGS", "CXXFLAGS", "CPPFLAGS", "LDFLAGS")},
+    )
+
+
+def incremental(component, name, stamp_dir, inputs, action, outputs=()):
+    """Run action() as phase `name` unless its stamp matches inputs and every
+    path in outputs exists. Returns the phase's fingerprint."""
+    fp = fingerprint(inputs)
+    stamp = Path(stamp_dir) / f"{component}-{name}.stamp"
+    if stamp.exists() and stamp.read_text() == fp and all(Path(p).exists() for p in outputs):
+        good(f"[UP TO DATE] {component}: {name}")
+        return fp
+
+    stamp.parent.mkdir(parents=True, exist_ok=True)
+    stamp.unlink(missing_ok=True)
+    with phase(component, name):
+        action()
+    stamp.write_text(fp)
+    return fp
+
+
+# Read size for downloads. Overridable with NINJA_DOWNLOAD_BLOCK_SIZE or the
+# block_size argument of download_file.
+DOWNLOAD_BLOCK_SIZE = int(os.environ.get("NINJA_DOWNLOAD_BLOCK_SIZE", 1024 * 1024))
+
+
+def _request(url, start=None, end=None, validator=None):
+    headers = {"User-Agent": "Mozilla/5.0"}  # avoids some weird blocking
+    if start is not None:
+        headers["Range"] = f"bytes={start}-{'' if end is None else end}"
+    if validator:
+        # The server sends the whole file instead of the range if it changed
+        headers["If-Range"] = validator
+    return urllib.request.urlopen(urllib.request.Request(url, headers=headers))
+
+
+def _progress(total, initial, dest):
+    return tqdm(
+        total=total,
+        initial=initial,
+        unit='B',
+        unit_scale=True,
+        unit_divisor=1024,
+        desc=str(dest)
+    )
+
+
+def _probe(url):
+    """Return (size, accepts_ranges) for url. size is None when unknown."""
+    with _request(url, 0, 0) as response:
+        if response.status == 206:
+            total = response.getheader("Content-Range", "").rpartition("/")[2]
+            return (int(total) if total.isdigit() else None), True
+        return int(response.getheader("Content-Length", 0)) or None, False
+
+
+def _download_stream(url, part: Path, block_size):
+    # Resume from whatever a previous attempt left in the .part file. Only a
+    # .part whose ETag or Last-Modified was saved in <part>.json is resumed,
+    # so bytes from another version of the file (or a preallocated, zero-filled
+    # .part from _download_ranges) are never extended or committed.
+    state_path = part.with_name(part.name + ".json")
+    validator = None
+    if part.exists():
+        try:
+            with open(state_path, "r", encoding="utf-8") as f:
+                validator = json.load(f)["validator"]
+        except (OSError, ValueError, KeyError):
+            pass
+        if not validator:
+            part.unlink()
+    offset = part.stat().st_size if part.exists() else 0
+    try:
+        response = _request(url, offset if offset else None, validator=validator)
+    except urllib.error.HTTPError as e:
+        if e.code == 416:
+            total = (e.headers.get("Content-Range") or "").rpartition("/")[2]
+            if total.isdigit() and int(total) == offset:  # .part already holds the whole file
+                state_path.unlink(missing_ok=True)
+                return
+            part.unlink(missing_ok=True)
+            state_path.unlink(missing_ok=True)
+            raise ConnectionError(f"{part.name} does not match {url}, starting over")
+        raise
+
+    with response:
+        if offset and response.status != 206:
+            warn("[DOWNLOAD] Server ignored Range or the file changed, starting over")
+            offset = 0
+        etag = response.getheader("ETag")
+        validator = etag if etag and not etag.startswith("W/") else response.getheader("Last-Modified")
+        if validator:
+            with open(state_path, "w", encoding="utf-8") as f:
+                json.dump({"validator": validator}, f)
+        else:
+            state_path.unlink(missing_ok=True)
+        total_size = offset + int(response.getheader('Content-Length', 0))
+        with open(part, 'ab' if offset else 'wb') as f, _progress(total_size, offset, part) as bar:
             while True:
                 buffer = response.read(block_size)
                 if not buffer:
                     break
                 f.write(buffer)
                 bar.update(len(buffer))
+                offset += len(buffer)
+        if offset < total_size:
+            raise ConnectionError(f"Connection closed early at byte {offset} of {total_size}")
+    state_path.unlink(missing_ok=True)
+
+
+def _download_ranges(url, part: Path, size, block_size, connections):
+    # Each range is [next byte to fetch, last byte]. Progress is written to
+    # <part>.json so an interrupted download only refetches what's missing.
+    state_path = part.with_name(part.name + ".json")
+    ranges = None
+    if part.exists() and state_path.exists():
+        try:
+            with open(state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state["size"] == size:
+                ranges = state["ranges"]
+        except (ValueError, KeyError):
+            pass
+
+    if ranges is None:
+        with open(part, "wb") as f:
+            f.truncate(size)
+        chunk = -(-size // connections)
+        ranges = [[start, min(start + chunk, size) - 1] for start in range(0, size, chunk)]
+
+    remaining = sum(end - start + 1 for start, end in ranges if start <= end)
+
+    def fetch(r, bar):
+        if r[0] > r[1]:
+            return
+        with _request(url, r[0], r[1]) as response, open(part, "r+b") as f:
+            if response.status != 206:
+                raise ConnectionError(f"Server ignored Range for {url}")
+            f.seek(r[0])
+            while r[0] <= r[1]:
+                buffer = response.read(min(block_size, r[1] - r[0] + 1))
+                if not buffer:
+                    break
+                f.write(buffer)
+                r[0] += len(buffer)
+                bar.update(len(buffer))
+        if r[0] <= r[1]:
+            raise ConnectionError(f"Connection closed early for bytes {r[0]}-{r[1]}")
+
+    try:
+        with _progress(size, size - remaining, part) as bar, ThreadPoolExecutor(connections) as pool:
+            for future in [pool.submit(fetch, r, bar) for r in ranges]:
+                future.result()
+    finally:
+        with open(state_path, "w", encoding="utf-8") as f:
+            json.dump({"size": size, "ranges": ranges}, f)
+    state_path.unlink()
+
+
+def _download(url, dest: Path, block_size=None, connections=1):
+    dest = Path(dest)  # ensure it's a Path object
+    part = dest.with_name(dest.name + ".part")
+    block_size = block_size or DOWNLOAD_BLOCK_SIZE
+
+    if connections > 1:
+        size, ranged = _probe(url)
+        if ranged and size:
+            _download_ranges(url, part, size, block_size, connections)
+            os.replace(part, dest)
+            return
+        warn(f"[DOWNLOAD] {url} does not support ranges, using one connection")
+        # A preallocated .part from an earlier ranged attempt can't be resumed
+        part.unlink(missing_ok=True)
+        part.with_name(part.name + ".json").unlink(missing_ok=True)
+
+    _download_stream(url, part, block_size)
+    os.replace(part, dest)
+
+# ----------------------------
+# Download cache
+# ----------------------------
+# Shared by every component. Objects are stored by content digest under
+# objects/<aa>/<digest>, and index.json maps each URL to its digest. The index
+# is kept in least-recently-used order (dicts keep insertion order), so a hit
+# is a dict lookup plus a move to the end and eviction pops from the front.
+CACHE_DIR = Path(os.environ.get("NINJA_CACHE_DIR", Path.home() / ".cache" / "ninja-packages"))
+CACHE_MAX_BYTES = int(os.environ.get("NINJA_CACHE_MAX_BYTES", 20 * 1024 ** 3))
+CACHE_ENABLED = os.environ.get("NINJA_NO_CACHE", "") == ""
+# Fail instead of downloading on a cache miss (used by the benchmark runner)
+CACHE_ONLY = os.environ.get("NINJA_CACHE_ONLY", "") != ""
+
+
+@contextmanager
+def _file_lock(path):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _cache_lock():
+    return _file_lock(CACHE_DIR / ".lock")
+
 
-def download_file(url, dest, checksum=None, retries=2):
+def _cache_load_index():
+    try:
+        with open(CACHE_DIR / "index.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _cache_save_index(index):
+    tmp = CACHE_DIR / "index.json.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp, CACHE_DIR / "index.json")
+
+
+def _cache_object(digest):
+    return CACHE_DIR / "objects" / digest[:2] / digest
+
+
+def _link_or_copy(src, dest):
+    src, dest = Path(src), Path(dest)
+    if dest.exists() or dest.is_symlink():
+        if dest.samefile(src):
+            return
+        dest.unlink()
+    try:
+        os.link(src, dest)
+    except OSError:
+        # Different filesystem or no hardlink support
+        with trace("copy", str(dest), bytes=src.stat().st_size):
+            shutil.copy2(src, dest)
+
+
+def _cache_evict(index):
+    objects = {entry["digest"]: entry["size"] for entry in index.values()}
+    total = sum(objects.values())
+    while total > CACHE_MAX_BYTES and index:
+        url = next(iter(index))
+        entry = index.pop(url)
+        if any(e["digest"] == entry["digest"] for e in index.values()):
+            continue
+        total -= entry["size"]
+        _cache_object(entry["digest"]).unlink(missing_ok=True)
+        info(f"[CACHE EVICT] {url}")
+
+
+def cache_fetch(url, dest, checksum=None):
+    """Link a cached copy of url into dest. Returns True on a cache hit."""
+    if not CACHE_ENABLED:
+        return False
+    with _cache_lock():
+        index = _cache_load_index()
+        entry = index.pop(url, None)
+        if entry is None:
+            return False
+        obj = _cache_object(entry["digest"])
+        if (checksum is not None and entry["digest"] != checksum) or not obj.exists():
+            _cache_save_index(index)
+            return False
+        index[url] = entry
+        _cache_save_index(index)
+    _link_or_copy(obj, dest)
+    return True
+
+
+def cache_store(url, src, digest=None):
+    """Add a downloaded file to the shared cache under url."""
+    if not CACHE_ENABLED:
+        return
+    if digest is None:
+        digest = sha256_checksum(src)
+    obj = _cache_object(digest)
+    with _cache_lock():
+        if not obj.exists():
+            obj.parent.mkdir(parents=True, exist_ok=True)
+            _link_or_copy(src, obj)
+        index = _cache_load_index()
+        index.pop(url, None)
+        index[url] = {"digest": digest, "size": obj.stat().st_size}
+        _cache_evict(index)
+        _cache_save_index(index)
+
+
+def download_file(url, dest, checksum=None, retries=2, block_size=None, connections=1):
     info(f"[DOWNLOAD] {url}")
 
+    if cache_fetch(url, dest, checksum):
+        good(f"[CACHED] {dest}")
+        return
+    if CACHE_ONLY:
+        raise RuntimeError(f"{url} is not in the download cache and NINJA_CACHE_ONLY is set")
+
     for attempt in range(1, retries + 1):
-        _download(url, dest)
+        try:
+            with trace("download", url) as event:
+                _download(url, dest, block_size, connections)
+                event["bytes"] = os.path.getsize(dest)
+        except OSError as e:
+            # The partial file is kept, so the next attempt resumes
+            warn(f"[DOWNLOAD INTERRUPTED] {e} Attempt {attempt}/{retries}")
+            if attempt == retries:
+                raise RuntimeError(f"Download failed for {url} after {retries} attempts: {e}")
+            continue
 
         if checksum is None:
-            break
+            cache_store(url, dest)
+            good(f"[SAVED] {dest}")
+            return
 
         info(f"[VERIFY] {dest}")
         if sha256_checksum(dest) == checksum:
+            cache_store(url, dest, checksum)
             good(f"[SAVED] {dest}")
             return
         else:
             info(f"[CHECKSUM MISMATCH] Attempt {attempt}/{retries}")
+            Path(dest).unlink()
 
     # If we reach here, all retries failed
     raise ValueError(f"Checksum verification failed for {dest} after {retries} attempts")
@@ -74,22 +879,490 @@ def download_file(url, dest, checksum=None, retries=2):
 
 def extract_tarball(tarball_path, dest="."):
     info(f"[EXTRACT] {tarball_path} -> {dest}")
-    with tarfile.open(tarball_path, "r:gz") as t:
+    with trace("extract", str(tarball_path), bytes=os.path.getsize(tarball_path)), tarfile.open(tarball_path, "r:gz") as t:
         t.extractall(dest)
     good(f"[EXTRACTED] {tarball_path}")
     
 def extract_zip(zip_path, dest="."):
     info(f"[EXTRACT] {zip_path} -> {dest}")
-    with zipfile.ZipFile(zip_path, "r") as z:
+    with trace("extract", str(zip_path), bytes=os.path.getsize(zip_path)), zipfile.ZipFile(zip_path, "r") as z:
         z.extractall(dest)
     good(f"[EXTRACTED] {zip_path}")
     
+# ----------------------------
+# Build profiles
+# ----------------------------
+# NINJA_PROFILE (set by the orchestrator's --profile) picks the flags every compiled component
+# is built with: the x86-64 ISA level, LTO, and whether debug symbols are kept
+# and split into <component>/artifact-debug. apply_build_profile() exports
+# CFLAGS/CXXFLAGS/LDFLAGS for autoconf, cmake_profile_args() covers CMake
+# (which only reads the environment on its first run) and GOAMD64 covers Go.
+# Every profile but generic builds in its own build-<name> directory and
+# installs into its own artifact-<name>, so switching never links objects
+# compiled with other flags or packages another profile's install. The profile also
+# goes into the artifact name and forge.json's platform.
+BUILD_PROFILES = {
+    "generic": {"isa": None, "lto": False, "debug": False, "suffix": ""},
+    "x86-64-v2": {"isa": "x86-64-v2", "lto": False, "debug": False, "suffix": "v2"},
+    "x86-64-v3": {"isa": "x86-64-v3", "lto": True, "debug": False, "suffix": "v3"},
+    "debug-symbols-split": {"isa": None, "lto": False, "debug": True, "suffix": "debug"},
+}
+
+
+BUILD_PROFILE = os.environ.get("NINJA_PROFILE") or "generic"
+if BUILD_PROFILE not in BUILD_PROFILES:
+    raise RuntimeError(f"Unknown build profile {BUILD_PROFILE!r}, expected one of {', '.join(BUILD_PROFILES)}")
+
+
+def build_profile():
+    profile = BUILD_PROFILES[BUILD_PROFILE]
+    if profile["isa"] and get_system_arch()[1] != "amd64":
+        raise RuntimeError(f"Build profile {BUILD_PROFILE} needs an x86_64 host")
+    return profile
+
+
+def build_dir_name():
+    return "build" if BUILD_PROFILE == "generic" else f"build-{BUILD_PROFILE}"
+
+
+def artifact_dir_name():
+    # Also the install prefix, so one profile's install never serves another's
+    return "artifact" if BUILD_PROFILE == "generic" else f"artifact-{BUILD_PROFILE}"
+
+
+def _is_clang():
+    return "clang" in (_tool_version(os.environ.get("CC", "cc")) or "").lower()
+
+
+def _lto_flag():
+    return "-flto=thin" if _is_clang() else "-flto=auto"
+
+
+def profile_flags():
+    """(compiler flags, linker flags) of the selected profile."""
+    profile = build_profile()
+    cflags, ldflags = ["-O2"], []
+    if profile["isa"]:
+        cflags.append(f"-march={profile['isa']} -mtune=generic")
+    if profile["lto"]:
+        cflags.append(_lto_flag())
+        ldflags.append(_lto_flag())
+    if profile["debug"]:
+        cflags.append("-g")
+    return " ".join(cflags), " ".join(ldflags)
+
+
+def apply_build_profile():
+    """Export the profile for autoconf builds and Go. Flags already in the
+    environment come last, so they win."""
+    profile = build_profile()
+    info(f"[PROFILE] {BUILD_PROFILE}")
+    if profile["isa"]:
+        os.environ["GOAMD64"] = profile["isa"].rsplit("-", 1)[1]
+    if os.name == "nt":
+        return  # MSVC takes no GCC-style flags; the CMake builds use cmake_profile_args()
+    cflags, ldflags = profile_flags()
+    for var, value in (("CFLAGS", cflags), ("CXXFLAGS", cflags), ("LDFLAGS", ldflags)):
+        os.environ[var] = " ".join(v for v in (value, os.environ.get(var, "")) if v)
+    if profile["lto"] and not _is_clang():
+        # Static libraries of LTO objects need the plugin-aware archiver
+        for var, tool in (("AR", "gcc-ar"), ("RANLIB", "gcc-ranlib"), ("NM", "gcc-nm")):
+            if shutil.which(tool) and var not in os.environ:
+                os.environ[var] = tool
+
+
+def cmake_profile_args():
+    profile = build_profile()
+    args = []
+    if os.name == "nt":
+        if profile["isa"] == "x86-64-v3":
+            args.append('-DCMAKE_C_FLAGS="/arch:AVX2" -DCMAKE_CXX_FLAGS="/arch:AVX2"')
+        elif profile["isa"]:
+            warn(f"MSVC has no {profile['isa']} target, building for the baseline")
+    elif profile["isa"]:
+        flags = f"-march={profile['isa']} -mtune=generic"
+        args.append(f'-DCMAKE_C_FLAGS="{flags}" -DCMAKE_CXX_FLAGS="{flags}"')
+    if profile["lto"]:
+        args.append("-DCMAKE_INTERPROCEDURAL_OPTIMIZATION=ON")
+    if profile["debug"]:
+        args.append(f"-DCMAKE_BUILD_TYPE={cmake_build_config()}")
+    return args
+
+
+def cmake_build_config():
+    """--config for multi-config generators (Visual Studio)."""
+    return "RelWithDebInfo" if BUILD_PROFILES[BUILD_PROFILE]["debug"] else "Release"
+
+
+_BINARY_MAGIC = (b"\x7fELF", b"\xcf\xfa\xed\xfe", b"\xce\xfa\xed\xfe", b"\xca\xfe\xba\xbe")
+
+
+def _is_binary(path):
+    with open(path, "rb") as f:
+        return f.read(4) in _BINARY_MAGIC
+
+
+def split_debug_symbols(artifact_dir, debug_dir):
+    """Move the debug info of every executable and shared library under
+    artifact_dir to the same relative path under debug_dir. Linux binaries
+    keep a .gnu_debuglink to theirs; macOS gets .dSYM bundles."""
+    if os.name == "nt":
+        return  # MSVC writes separate .pdb files already
+    count = 0
+    for root, _, files in os.walk(artifact_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            if os.path.islink(path) or not _is_binary(path):
+                continue
+            debug = os.path.join(debug_dir, os.path.relpath(path, artifact_dir))
+            os.makedirs(os.path.dirname(debug), exist_ok=True)
+            if platform.system() == "Darwin":
+                run(f'dsymutil "{path}" -o "{debug}.dSYM"')
+                run(f'strip -S "{path}"')
+            else:
+                run(f'objcopy --only-keep-debug "{path}" "{debug}.debug"')
+                run(f'objcopy --strip-debug --add-gnu-debuglink="{debug}.debug" "{path}"')
+            count += 1
+    good(f"[DEBUG] symbols of {count} binaries moved to {debug_dir}")
+
+
+def forge_platform(profile=None):
+    """forge.json platform, e.g. linux-x86_64 or linux-x86_64-v3."""
+    system, arch = get_system_arch()
+    system = {"darwin": "macos"}.get(system, system)
+    arch = {"amd64": "x86_64", "arm64": "aarch64", "386": "i686"}.get(arch, arch)
+    isa = BUILD_PROFILES[profile or BUILD_PROFILE]["isa"]
+    return f"{system}-{arch}-{isa.rsplit('-', 1)[1]}" if isa else f"{system}-{arch}"
+
+
+def artifact_name(component, profile=None):
+    """<component>-<platform>[-debug], the file name of the packaged shuriken."""
+    name = f"{component}-{forge_platform(profile)}"
+    return f"{name}-debug" if BUILD_PROFILES[profile or BUILD_PROFILE]["debug"] else name
+
+
+def write_forge(component, dest, profile=None):
+    """Copy <component>/forge.json to dest with the platform and profile of
+    this build. Components that ship upstream binaries pass profile="generic"."""
+    root = Path(__file__).resolve().parent / component
+    if not (root / "forge.json").exists():
+        warn(f"{component} has no forge.json, the shuriken goes without one")
+        return
+    with open(root / "forge.json", "r", encoding="utf-8") as f:
+        forge = json.load(f)
+    forge["platform"] = forge_platform(profile)
+    forge["profile"] = profile or BUILD_PROFILE
+    with open(Path(dest) / "forge.json", "w", encoding="utf-8") as f:
+        json.dump(forge, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+
+# ----------------------------
+# Profile-guided optimization
+# ----------------------------
+# With NINJA_PGO=1 (or --pgo) the compile phase runs twice: an instrumented
+# build (-fprofile-generate) is run on the component's training workload, then
+# everything is rebuilt with -fprofile-use. The profile is kept under
+# CACHE_DIR/pgo/<component>/<fingerprint of the configure phase>, so it is
+# reused until the upstream version, configure flags or toolchain change.
+PGO = os.environ.get("NINJA_PGO", "") != "" or "--pgo" in sys.argv[1:]
+PGO_DIR = CACHE_DIR / "pgo"
+PGO_SECONDS = int(os.environ.get("NINJA_PGO_SECONDS", 30))
+
+
+def pgo_flags(stage, profile):
+    """Compiler and linker flags for the "generate" or "use" stage."""
+    if stage == "generate":
+        return f"-fprofile-generate={profile}"
+    if _is_clang():
+        return (f"-fprofile-use={profile / 'default.profdata'} "
+                "-Wno-profile-instr-unprofiled -Wno-profile-instr-out-of-date")
+    # Code the workload never reached is optimized as usual, not for size
+    return f"-fprofile-use={profile} -fprofile-partial-training -Wno-missing-profile"
+
+
+def _merge_profile(profile):
+    # GCC reads its .gcda files directly; clang wants the raw profiles merged
+    if _is_clang():
+        tool = "llvm-profdata" if shutil.which("llvm-profdata") else "xcrun llvm-profdata"
+        run(f'{tool} merge -output="{profile / "default.profdata"}" "{profile}"')
+
+
+def pgo_compile(component, stamp_dir, inputs, make, clean, train, outputs=()):
+    """The compile phase, profile-guided when PGO is on. make(flags) builds
+    with flags added to the compiler and linker flags, clean() removes the
+    objects and train() runs the workload on the instrumented build.
+    Returns the phase's fingerprint like incremental()."""
+    profile = PGO_DIR / component / fingerprint(inputs) if PGO else None
+    flags_file = Path(stamp_dir) / f"{component}-pgo-flags"
+
+    def build(flags):
+        # make only looks at timestamps, so objects built with other profile
+        # flags have to go first
+        built = flags_file.read_text() if flags_file.exists() else ""
+        if built != flags:
+            clean()
+        flags_file.parent.mkdir(parents=True, exist_ok=True)
+        flags_file.unlink(missing_ok=True)
+        make(flags)
+        flags_file.write_text(flags)
+
+    if profile is not None:
+        if (profile / ".complete").exists():
+            good(f"[PGO] {component}: reusing profile {profile}")
+        else:
+            shutil.rmtree(profile, ignore_errors=True)
+            profile.mkdir(parents=True)
+            with phase(component, "pgo-generate"):
+                build(pgo_flags("generate", profile))
+            with phase(component, "pgo-train"):
+                train()
+                _merge_profile(profile)
+            (profile / ".complete").touch()
+
+    flags = pgo_flags("use", profile) if profile is not None else ""
+    return incremental(component, "compile", stamp_dir, [inputs, flags], lambda: build(flags), outputs)
+
+
+# ----------------------------
+# Host detection
+# ----------------------------
+# host.ns fills in the host options (cpus, memory_mb, disk) that the scaffolds
+# leave at 0 or "auto" in options.toml, on the machine a shuriken is
+# installed on.
+HOST_SCRIPT = Path(__file__).resolve().parent / "host.ns"
+
+
+def add_host_detection(postinstall):
+    """Put host.ns in front of a packaged postinstall.ns, so every shuriken
+    detects the host the same way."""
+    postinstall = Path(postinstall)
+    script = postinstall.read_text(encoding="utf-8")
+    detection = HOST_SCRIPT.read_text(encoding="utf-8")
+    if not script.startswith(detection):
+        postinstall.write_text(detection + "\n" + script, encoding="utf-8")
+
+
+# ----------------------------
+# Upstream version resolution
+# ----------------------------
+# Index pages and API responses used to find the latest versions are cached
+# under CACHE_DIR/http for NINJA_RESOLVE_TTL seconds and then revalidated with
+# ETag / If-Modified-Since. When a mirror is down the stale copy is used.
+# Every resolved version is written to versions.lock; with NINJA_OFFLINE set
+# the builders read it back instead of touching the network at all.
+RESOLVE_TTL = int(os.environ.get("NINJA_RESOLVE_TTL", 3600))
+OFFLINE = os.environ.get("NINJA_OFFLINE", "") != ""
+LOCKFILE = Path(os.environ.get("NINJA_LOCKFILE", Path(__file__).resolve().parent / "versions.lock"))
+
+
+def http_get(url, headers):
+    """GET url once. Returns (status, headers with lowercase names, body);
+    304 Not Modified comes back as a status instead of an exception."""
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=30) as response:
+            return response.status, {k.lower(): v for k, v in response.getheaders()}, response.read()
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return 304, {k.lower(): v for k, v in e.headers.items()}, b""
+        raise
+
+
+def fetch_text(url, ttl=None, get=http_get):
+    """GET url as text through the metadata cache. `get` has http_get's
+    signature and lets callers supply their own connections."""
+    ttl = RESOLVE_TTL if ttl is None else ttl
+    path = CACHE_DIR / "http" / f"{hashlib.sha256(url.encode()).hexdigest()}.json"
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (FileNotFoundError, ValueError):
+        cached = None
+
+    if cached and time.time() - cached["fetched"] < ttl:
+        return cached["body"]
+
+    headers = {"User-Agent": "Mozilla/5.0"}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+
+    try:
+        status, response_headers, body = get(url, headers)
+    except OSError as e:
+        if not cached:
+            raise
+        warn(f"[STALE] {url} unreachable ({e}), using the copy from {time.ctime(cached['fetched'])}")
+        return cached["body"]
+
+    if status == 304 and cached:
+        info(f"[NOT MODIFIED] {url}")
+    else:
+        cached = {
+            "url": url,
+            "etag": response_headers.get("etag"),
+            "last_modified": response_headers.get("last-modified"),
+            "body": body.decode("utf-8", errors="replace"),
+        }
+
+    cached["fetched"] = time.time()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cached, f)
+    os.replace(tmp, path)
+    return cached["body"]
+
+
+def fetch_json(url, ttl=None):
+    return json.loads(fetch_text(url, ttl))
+
+
+def _read_lockfile():
+    try:
+        with open(LOCKFILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def locked(name, resolver):
+    """Return resolver()'s result and record it in the lockfile under name.
+
+    Offline, the recorded value is returned without calling resolver. Results
+    must be JSON-serializable; tuples come back as lists.
+    """
+    if OFFLINE:
+        lock = _read_lockfile()
+        if name not in lock:
+            raise RuntimeError(f"Offline mode: {name} is not pinned in {LOCKFILE}")
+        info(f"[PINNED] {name}: {lock[name]}")
+        return lock[name]
+
+    value = resolver()
+    with _file_lock(LOCKFILE.with_name(LOCKFILE.name + ".lock")):
+        lock = _read_lockfile()
+        lock[name] = value
+        tmp = LOCKFILE.with_name(LOCKFILE.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(lock, f, indent=2, sort_keys=True)
+            f.write("\n")
+        os.replace(tmp, LOCKFILE)
+    return value
+
+
+# ----------------------------
+# Streaming extraction
+# ----------------------------
+# With NINJA_STREAM_EXTRACT set, download_and_extract never writes the archive
+# to disk: the response body is hashed as it arrives and piped straight into
+# tarfile, extracting into a staging dir that is only moved into place once
+# the digest matches. Without it (the default) the archive goes through
+# download_file, so the shared download cache keeps working.
+STREAM_EXTRACT = os.environ.get("NINJA_STREAM_EXTRACT", "") != ""
+
+
+class _HashingReader:
+    """File-like wrapper that hashes everything tarfile reads from a response."""
+
+    def __init__(self, response, bar):
+        self.response = response
+        self.bar = bar
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size=-1):
+        buffer = self.response.read(size)
+        self.sha256.update(buffer)
+        self.size += len(buffer)
+        self.bar.update(len(buffer))
+        return buffer
+
+
+def _commit_staging(staging, dest):
+    for entry in os.listdir(staging):
+        target = os.path.join(dest, entry)
+        if os.path.isdir(target) and not os.path.islink(target):
+            shutil.rmtree(target)
+        elif os.path.lexists(target):
+            os.remove(target)
+        os.replace(os.path.join(staging, entry), target)
+    os.rmdir(staging)
+
+
+def _stream_extract(url, dest, checksum, block_size):
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=dest)
+    try:
+        with _request(url) as response:
+            total_size = int(response.getheader('Content-Length', 0))
+            with _progress(total_size, 0, url.rsplit("/", 1)[-1]) as bar:
+                reader = _HashingReader(response, bar)
+                with tarfile.open(fileobj=reader, mode="r|*", bufsize=block_size) as t:
+                    t.extractall(staging)
+                # tarfile stops at the end-of-archive marker, hash the padding too
+                while reader.read(block_size):
+                    pass
+        if total_size and reader.size < total_size:
+            raise ConnectionError(f"Connection closed early at byte {reader.size} of {total_size}")
+        digest = reader.sha256.hexdigest()
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    if checksum is not None and digest != checksum:
+        shutil.rmtree(staging, ignore_errors=True)
+        return False
+
+    _commit_staging(staging, dest)
+    return True
+
+
+def download_and_extract(url, dest=".", archive=None, checksum=None, retries=2, block_size=None, connections=1):
+    """Download url and extract it into dest.
+
+    archive is where the file is kept when it isn't streamed; it defaults to the
+    URL's file name inside dest. Zip archives always go through disk since their
+    index is at the end of the file.
+    """
+    dest = Path(dest)
+    dest.mkdir(parents=True, exist_ok=True)
+    archive = Path(archive) if archive else dest / url.rsplit("/", 1)[-1]
+    is_zip = archive.suffix == ".zip"
+
+    if not STREAM_EXTRACT or is_zip or CACHE_ONLY or cache_fetch(url, archive, checksum):
+        download_file(url, archive, checksum, retries, block_size, connections)
+        if is_zip:
+            extract_zip(archive, dest)
+        else:
+            extract_tarball(archive, dest)
+        return
+
+    info(f"[STREAM] {url} -> {dest}")
+    block_size = block_size or DOWNLOAD_BLOCK_SIZE
+    for attempt in range(1, retries + 1):
+        try:
+            with trace("extract", url, streamed=True):
+                committed = _stream_extract(url, dest, checksum, block_size)
+            if committed:
+                good(f"[EXTRACTED] {url}")
+                return
+            info(f"[CHECKSUM MISMATCH] Attempt {attempt}/{retries}")
+        except (OSError, tarfile.TarError) as e:
+            warn(f"[DOWNLOAD INTERRUPTED] {e} Attempt {attempt}/{retries}")
+
+    raise ValueError(f"Streaming extraction of {url} failed after {retries} attempts")
+
+
 def clean():
     project_root = os.path.abspath(".")
-    build_dir = os.path.join(project_root, "build")
-    artifact_dir = os.path.join(project_root, "artifact")
+    # build-<profile>, artifact-<profile> and artifact-debug come from the
+    # non-generic profiles
+    dirs = [os.path.join(project_root, "build"), os.path.join(project_root, "artifact")]
+    dirs += sorted(str(p) for p in Path(project_root).glob("build-*"))
+    dirs += sorted(str(p) for p in Path(project_root).glob("artifact-*"))
 
-    for d in (build_dir, artifact_dir):
+    for d in dirs:
         if os.path.exists(d):
             warn(f"Removing {d}")
             shutil.rmtree(d)
@@ -170,43 +1443,15 @@ def install_go():
 import os
 from urllib.request import Request, urlopen
 
-def download_go(system, arch, version="1.21.0", out_dir="."):
+def download_go(system, arch, version="1.21.0", out_dir=".", checksum=None):
     ext = "zip" if system == "windows" else "tar.gz"
 
     filename = f"go{version}.{system}-{arch}.{ext}"
     filepath = os.path.join(out_dir, filename)
     url = f"https://go.dev/dl/{filename}"
 
-    # Skip if already downloaded
-    if os.path.exists(filepath):
-        info(f"Using cached {filename}")
-        return filepath
-
-    info(f"⬇ Downloading {url}")
-
-    req = Request(url, headers={
-        "User-Agent": "Mozilla/5.0"  # avoids some weird blocking
-    })
-
     try:
-        with urlopen(req) as response, open(filepath, "wb") as out_file:
-            total = response.length  # may be None
-            downloaded = 0
-            chunk_size = 8192
-
-            while True:
-                chunk = response.read(chunk_size)
-                if not chunk:
-                    break
-                out_file.write(chunk)
-                downloaded += len(chunk)
-
-                # Optional progress
-                if total:
-                    percent = downloaded * 100 // total
-                    print(f"\r {percent}% ", end="")
-
-        good("\nDownload complete")
+        download_file(url, filepath, checksum=checksum)
         return filepath
 
     except Exception as e: